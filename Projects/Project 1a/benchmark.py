@@ -0,0 +1,229 @@
+import multiprocessing
+import random
+import sys
+import time
+import tracemalloc
+
+import puzzle
+from logic import *
+
+CLAUSES = 2000
+SYMBOLS = 12
+REPEATS = 20
+TELLS = 30
+
+
+def main():
+    benchmarks = {
+        "freeze": benchmark_freeze,
+        "incremental": benchmark_incremental,
+        "pruning": benchmark_pruning,
+        "counting": benchmark_counting,
+        "parallel": benchmark_parallel
+    }
+    if len(sys.argv) > 2 or (
+        len(sys.argv) == 2 and sys.argv[1] not in benchmarks
+    ):
+        sys.exit(f"Usage: python benchmark.py [{'|'.join(benchmarks)}]")
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        benchmarks[name]()
+
+
+def generate_knowledge(clauses, symbols, seed=0):
+    """
+    Return a large random knowledge base built from fresh sentence objects.
+    Subformulas repeat often, as they do in generated puzzle encodings.
+    """
+    rng = random.Random(seed)
+    names = [f"P{i}" for i in range(symbols)]
+
+    def literal():
+        symbol = Symbol(rng.choice(names))
+        return symbol if rng.random() < 0.5 else Not(symbol)
+
+    knowledge = And()
+    for _ in range(clauses):
+        left = Or(literal(), literal())
+        right = And(literal(), literal())
+        knowledge.add(rng.choice([
+            Implication(left, right),
+            Biconditional(left, right),
+            Or(left, Not(right))
+        ]))
+    return knowledge
+
+
+def timed(function, repeats=REPEATS):
+    """Return the average wall time of `function` over `repeats` calls."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def benchmark_freeze(clauses=CLAUSES):
+    """Compare plain and hash-consed sentences on a generated knowledge base."""
+    tracemalloc.start()
+    plain = generate_knowledge(clauses, SYMBOLS)
+    plain_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    frozen = generate_knowledge(clauses, SYMBOLS).freeze()
+    frozen_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"Knowledge base with {clauses} clauses over {SYMBOLS} symbols")
+    print(f"  memory:    plain {plain_memory / 1024:.0f} KiB, "
+          f"frozen {frozen_memory / 1024:.0f} KiB")
+    for name, operation in [
+        ("symbols()", lambda kb: kb.symbols()),
+        ("hash()", lambda kb: hash(kb)),
+        ("formula()", lambda kb: kb.formula())
+    ]:
+        before = timed(lambda: operation(plain))
+        after = timed(lambda: operation(frozen))
+        print(f"  {name:10} plain {before * 1000:.3f} ms, "
+              f"frozen {after * 1000:.3f} ms")
+
+
+def benchmark_incremental(tells=TELLS):
+    """
+    Add generated clauses one at a time, asking one query after each,
+    with model checking, a fresh solver per query and one incremental
+    knowledge base.
+    """
+    clauses = generate_knowledge(tells, SYMBOLS, seed=1).conjuncts
+    rng = random.Random(2)
+    queries = [Symbol(f"P{rng.randrange(SYMBOLS)}") for _ in clauses]
+    assumptions = [[Not(Symbol(f"P{rng.randrange(SYMBOLS)}"))]
+                   for _ in clauses]
+
+    def model_checking():
+        told = And()
+        for clause, query, assumed in zip(clauses, queries, assumptions):
+            told.add(clause)
+            model_check(And(told, *assumed), query)
+
+    def restarting():
+        for k, (query, assumed) in enumerate(zip(queries, assumptions)):
+            KnowledgeBase(*clauses[:k + 1]).ask(query, assumed)
+
+    def incremental():
+        knowledge = KnowledgeBase()
+        for clause, query, assumed in zip(clauses, queries, assumptions):
+            knowledge.tell(clause)
+            knowledge.ask(query, assumed)
+
+    print(f"{tells} tell/ask steps over {SYMBOLS} symbols")
+    for name, run in [
+        ("model_check", model_checking),
+        ("fresh solver", restarting),
+        ("incremental", incremental)
+    ]:
+        print(f"  {name:12} {timed(run, repeats=3) * 1000:.1f} ms")
+
+
+def benchmark_pruning():
+    """
+    Count the models visited by model_check on the puzzles,
+    with and without pruning.
+    """
+    symbols = [puzzle.AKnight, puzzle.AKnave, puzzle.BKnight,
+               puzzle.BKnave, puzzle.CKnight, puzzle.CKnave]
+    puzzles = [
+        ("Puzzle 0", puzzle.knowledge0),
+        ("Puzzle 1", puzzle.knowledge1),
+        ("Puzzle 2", puzzle.knowledge2),
+        ("Puzzle 3", puzzle.knowledge3),
+        ("Generated", generate_knowledge(40, 16, seed=3))
+    ]
+    print("Models visited by model_check over all queries")
+    for name, knowledge in puzzles:
+        visited = []
+        for prune in [False, True]:
+            total = 0
+            start = time.perf_counter()
+            for symbol in symbols:
+                stats = dict()
+                model_check(knowledge, symbol, prune=prune, stats=stats)
+                total += stats["nodes"]
+            visited.append((total, time.perf_counter() - start))
+        (before, slow), (after, fast) = visited
+        print(f"  {name:10} {before:7} -> {after:5} nodes, "
+              f"{slow * 1000:.1f} -> {fast * 1000:.1f} ms")
+
+
+def generate_islands(islands, size=10, clauses=15, seed=0):
+    """
+    Return a knowledge base made of small islands of random clauses,
+    each linked to the one before it by a single implication.
+    """
+    rng = random.Random(seed)
+    symbols = [Symbol(f"P{i}") for i in range(islands * size)]
+    knowledge = And()
+    for island in range(islands):
+        members = symbols[island * size:(island + 1) * size]
+        for _ in range(clauses):
+            knowledge.add(Or(*[
+                symbol if rng.random() < 0.5 else Not(symbol)
+                for symbol in rng.sample(members, 3)
+            ]))
+        if island > 0:
+            knowledge.add(Implication(
+                rng.choice(symbols[(island - 1) * size:island * size]),
+                rng.choice(members)
+            ))
+    return knowledge
+
+
+def benchmark_counting():
+    """Count and stream models of knowledge bases with hundreds of symbols."""
+    print("Model counting")
+    symbols = [Symbol(f"P{i}") for i in range(300)]
+    cases = [
+        ("chain", And(*[
+            Implication(symbols[i], symbols[i + 1]) for i in range(299)
+        ]))
+    ] + [
+        (f"{islands} islands", generate_islands(islands))
+        for islands in [10, 20, 30, 40]
+    ]
+    for name, knowledge in cases:
+        start = time.perf_counter()
+        count = count_models(knowledge)
+        counted = time.perf_counter() - start
+        start = time.perf_counter()
+        models = enumerate_models(knowledge)
+        for _ in range(100):
+            next(models)
+        streamed = time.perf_counter() - start
+        print(f"  {name:10} {len(knowledge.symbols()):4} symbols, "
+              f"{count:.3e} models, counted in {counted * 1000:.0f} ms, "
+              f"first 100 streamed in {streamed * 1000:.0f} ms")
+
+
+def benchmark_parallel(symbols=18):
+    """
+    Time full enumeration by parallel_model_check across worker counts,
+    for an entailed query and for one with a counterexample.
+    """
+    knowledge = generate_islands(symbols // 6, size=6, clauses=3, seed=4)
+    entailed = Or(Symbol("P0"), Not(Symbol("P0")))
+    refuted = Symbol("P0")
+    print(f"Parallel model checking without pruning, "
+          f"{len(knowledge.symbols())} symbols")
+    print(f"  {multiprocessing.cpu_count()} CPUs available")
+    for workers in [1, 2, 4, 8]:
+        times = []
+        for query in [entailed, refuted]:
+            start = time.perf_counter()
+            parallel_model_check(knowledge, query, workers, prune=False)
+            times.append(time.perf_counter() - start)
+        print(f"  {workers} workers: entailed {times[0] * 1000:.0f} ms, "
+              f"counterexample {times[1] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
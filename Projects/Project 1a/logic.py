@@ -1,12 +1,67 @@
 import itertools
+import multiprocessing
+import os
+import weakref
 
 
 class Sentence():
 
+    # Cached hash, symbol set and formula are only kept on frozen sentences
+    __slots__ = ("_frozen", "_hash", "_symbols", "_formula", "__weakref__")
+
+    # Table of frozen sentences, so identical subformulas share one node
+    _interned = weakref.WeakValueDictionary()
+
+    def _init_cache(self):
+        self._frozen = False
+        self._hash = None
+        self._symbols = None
+        self._formula = None
+
+    def freeze(self):
+        """
+        Returns an immutable, hash-consed copy of the logical sentence.
+        Identical frozen subformulas are the same object, and their hash,
+        symbol set and formula are computed only once.
+        """
+        raise Exception("nothing to freeze")
+
+    @classmethod
+    def _intern(cls, key, build):
+        """Returns the frozen node for `key`, building it if needed."""
+        node = Sentence._interned.get(key)
+        if node is None:
+            node = build()
+            node._frozen = True
+            node._hash = hash(node)
+            Sentence._interned[key] = node
+        return node
+
+    def _cache_symbols(self, symbols):
+        """Remembers the symbol set of a frozen sentence."""
+        if self._frozen:
+            self._symbols = frozenset(symbols)
+            return self._symbols
+        return symbols
+
+    def _cache_formula(self, formula):
+        """Remembers the formula of a frozen sentence."""
+        if self._frozen:
+            self._formula = formula
+        return formula
+
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def partial(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave some
+        symbols unassigned. Returns True or False if the value is already
+        determined, or None if it depends on the unassigned symbols.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
@@ -43,14 +98,18 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
     def __init__(self, name):
+        self._init_cache()
         self.name = name
 
     def __eq__(self, other):
         return isinstance(other, Symbol) and self.name == other.name
 
     def __hash__(self):
+        if self._hash is not None:
+            return self._hash
         return hash(("symbol", self.name))
 
     def __repr__(self):
@@ -62,22 +121,40 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
     def formula(self):
         return self.name
 
     def symbols(self):
-        return {self.name}
+        if self._symbols is not None:
+            return self._symbols
+        return self._cache_symbols({self.name})
+
+    def freeze(self):
+        if self._frozen:
+            return self
+        return Sentence._intern((Symbol, self.name), lambda: Symbol(self.name))
 
 
 class Not(Sentence):
+    __slots__ = ("operand",)
+
     def __init__(self, operand):
+        self._init_cache()
         Sentence.validate(operand)
         self.operand = operand
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return isinstance(other, Not) and self.operand == other.operand
 
     def __hash__(self):
+        if self._hash is not None:
+            return self._hash
         return hash(("not", hash(self.operand)))
 
     def __repr__(self):
@@ -86,23 +163,47 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def partial(self, model):
+        value = self.operand.partial(model)
+        return None if value is None else not value
+
     def formula(self):
-        return "¬" + Sentence.parenthesize(self.operand.formula())
+        if self._formula is not None:
+            return self._formula
+        return self._cache_formula(
+            "¬" + Sentence.parenthesize(self.operand.formula())
+        )
 
     def symbols(self):
-        return self.operand.symbols()
+        if self._symbols is not None:
+            return self._symbols
+        return self._cache_symbols(self.operand.symbols())
+
+    def freeze(self):
+        if self._frozen:
+            return self
+        operand = self.operand.freeze()
+        return Sentence._intern((Not, operand), lambda: Not(operand))
 
 
 class And(Sentence):
+    __slots__ = ("conjuncts",)
+
     def __init__(self, *conjuncts):
+        self._init_cache()
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        if self is other:
+            return True
+        return (isinstance(other, And)
+                and tuple(self.conjuncts) == tuple(other.conjuncts))
 
     def __hash__(self):
+        if self._hash is not None:
+            return self._hash
         return hash(
             ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
         )
@@ -114,32 +215,71 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        if self._frozen:
+            raise TypeError("cannot add to a frozen sentence")
         Sentence.validate(conjunct)
         self.conjuncts.append(conjunct)
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
+        if self._formula is not None:
+            return self._formula
         if len(self.conjuncts) == 1:
-            return self.conjuncts[0].formula()
-        return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
-                            for conjunct in self.conjuncts])
+            return self._cache_formula(self.conjuncts[0].formula())
+        return self._cache_formula(" ∧ ".join(
+            [Sentence.parenthesize(conjunct.formula())
+             for conjunct in self.conjuncts]
+        ))
 
     def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        if self._symbols is not None:
+            return self._symbols
+        return self._cache_symbols(
+            set().union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        )
+
+    def freeze(self):
+        if self._frozen:
+            return self
+        conjuncts = tuple(conjunct.freeze() for conjunct in self.conjuncts)
+
+        def build():
+            node = And()
+            node.conjuncts = conjuncts
+            return node
+        return Sentence._intern((And, conjuncts), build)
 
 
 class Or(Sentence):
+    __slots__ = ("disjuncts",)
+
     def __init__(self, *disjuncts):
+        self._init_cache()
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
         self.disjuncts = list(disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        if self is other:
+            return True
+        return (isinstance(other, Or)
+                and tuple(self.disjuncts) == tuple(other.disjuncts))
 
     def __hash__(self):
+        if self._hash is not None:
+            return self._hash
         return hash(
             ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
         )
@@ -151,29 +291,65 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
+        if self._formula is not None:
+            return self._formula
         if len(self.disjuncts) == 1:
-            return self.disjuncts[0].formula()
-        return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
-                            for disjunct in self.disjuncts])
+            return self._cache_formula(self.disjuncts[0].formula())
+        return self._cache_formula(" ∨  ".join(
+            [Sentence.parenthesize(disjunct.formula())
+             for disjunct in self.disjuncts]
+        ))
 
     def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        if self._symbols is not None:
+            return self._symbols
+        return self._cache_symbols(
+            set().union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        )
+
+    def freeze(self):
+        if self._frozen:
+            return self
+        disjuncts = tuple(disjunct.freeze() for disjunct in self.disjuncts)
+
+        def build():
+            node = Or()
+            node.disjuncts = disjuncts
+            return node
+        return Sentence._intern((Or, disjuncts), build)
 
 
 class Implication(Sentence):
+    __slots__ = ("antecedent", "consequent")
+
     def __init__(self, antecedent, consequent):
+        self._init_cache()
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
         self.antecedent = antecedent
         self.consequent = consequent
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return (isinstance(other, Implication)
                 and self.antecedent == other.antecedent
                 and self.consequent == other.consequent)
 
     def __hash__(self):
+        if self._hash is not None:
+            return self._hash
         return hash(("implies", hash(self.antecedent), hash(self.consequent)))
 
     def __repr__(self):
@@ -183,28 +359,62 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def partial(self, model):
+        antecedent = self.antecedent.partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
     def formula(self):
+        if self._formula is not None:
+            return self._formula
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
-        return f"{antecedent} => {consequent}"
+        return self._cache_formula(f"{antecedent} => {consequent}")
 
     def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+        if self._symbols is not None:
+            return self._symbols
+        return self._cache_symbols(
+            set().union(self.antecedent.symbols(), self.consequent.symbols())
+        )
+
+    def freeze(self):
+        if self._frozen:
+            return self
+        antecedent = self.antecedent.freeze()
+        consequent = self.consequent.freeze()
+        return Sentence._intern(
+            (Implication, antecedent, consequent),
+            lambda: Implication(antecedent, consequent)
+        )
 
 
 class Biconditional(Sentence):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
+        self._init_cache()
         Sentence.validate(left)
         Sentence.validate(right)
         self.left = left
         self.right = right
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return (isinstance(other, Biconditional)
                 and self.left == other.left
                 and self.right == other.right)
 
     def __hash__(self):
+        if self._hash is not None:
+            return self._hash
         return hash(("biconditional", hash(self.left), hash(self.right)))
 
     def __repr__(self):
@@ -216,20 +426,80 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def partial(self, model):
+        left = self.left.partial(model)
+        if left is None:
+            return None
+        right = self.right.partial(model)
+        if right is None:
+            return None
+        return left == right
+
     def formula(self):
+        if self._formula is not None:
+            return self._formula
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
-        return f"{left} <=> {right}"
+        return self._cache_formula(f"{left} <=> {right}")
 
     def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+        if self._symbols is not None:
+            return self._symbols
+        return self._cache_symbols(
+            set().union(self.left.symbols(), self.right.symbols())
+        )
+
+    def freeze(self):
+        if self._frozen:
+            return self
+        left = self.left.freeze()
+        right = self.right.freeze()
+        return Sentence._intern(
+            (Biconditional, left, right), lambda: Biconditional(left, right)
+        )
 
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+def occurrences(sentence, counts=None):
+    """Returns a dictionary counting how often each symbol occurs."""
+    if counts is None:
+        counts = dict()
+    if isinstance(sentence, Symbol):
+        counts[sentence.name] = counts.get(sentence.name, 0) + 1
+    elif isinstance(sentence, Not):
+        occurrences(sentence.operand, counts)
+    elif isinstance(sentence, And):
+        for conjunct in sentence.conjuncts:
+            occurrences(conjunct, counts)
+    elif isinstance(sentence, Or):
+        for disjunct in sentence.disjuncts:
+            occurrences(disjunct, counts)
+    elif isinstance(sentence, Implication):
+        occurrences(sentence.antecedent, counts)
+        occurrences(sentence.consequent, counts)
+    elif isinstance(sentence, Biconditional):
+        occurrences(sentence.left, counts)
+        occurrences(sentence.right, counts)
+    return counts
+
+
+def model_check(knowledge, query, prune=True, stats=None, model=None):
+    """
+    Checks if knowledge base entails query.
+
+    With `prune`, partial models are evaluated as they are built, and a
+    branch is cut off as soon as the knowledge base is false or the query
+    is true in every completion. Symbols are then assigned in order of how
+    often they occur. If `stats` is a dictionary, the number of models
+    visited is stored under "nodes". If `model` is given, only models
+    that extend it are checked.
+    """
+    if stats is not None:
+        stats["nodes"] = 0
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
+        if stats is not None:
+            stats["nodes"] += 1
 
         # If model has an assignment for each symbol
         if not symbols:
@@ -256,8 +526,581 @@ def model_check(knowledge, query):
             return (check_all(knowledge, query, remaining, model_true) and
                     check_all(knowledge, query, remaining, model_false))
 
+    def check_partial(knowledge, query, order, index, model):
+        """
+        Checks if knowledge base entails query in every completion
+        of a partial model that assigns the first `index` symbols.
+        """
+        if stats is not None:
+            stats["nodes"] += 1
+
+        # Nothing to check in branches where the knowledge base is false
+        known = knowledge.partial(model)
+        if known is False:
+            return True
+
+        # Entailment holds in the branch if the query is already true
+        answer = query.partial(model)
+        if answer is not None and known is True:
+            return answer
+        if answer is True:
+            return True
+
+        # Branch on the next most frequent symbol
+        p = order[index]
+        model[p] = True
+        entailed = check_partial(knowledge, query, order, index + 1, model)
+        if entailed:
+            model[p] = False
+            entailed = check_partial(
+                knowledge, query, order, index + 1, model
+            )
+        del model[p]
+        return entailed
+
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = set().union(knowledge.symbols(), query.symbols())
+    model = dict() if model is None else dict(model)
+    symbols = symbols - set(model)
 
     # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    if not prune:
+        return check_all(knowledge, query, symbols, model)
+    return check_partial(knowledge, query, branching_order(
+        knowledge, query, symbols
+    ), 0, model)
+
+
+def branching_order(knowledge, query, symbols):
+    """Returns `symbols` sorted by how often they occur, most frequent first."""
+    counts = occurrences(query, occurrences(knowledge))
+    return sorted(symbols, key=lambda symbol: -counts.get(symbol, 0))
+
+
+def parallel_model_check(knowledge, query, workers=None, depth=None,
+                         prune=True):
+    """
+    Checks if knowledge base entails query, using a pool of `workers`
+    processes. Fixing the first `depth` symbols splits the models into
+    2 ** depth independent partitions, which are checked in parallel.
+    As soon as any partition contains a counterexample, the remaining
+    workers are stopped.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    symbols = set().union(knowledge.symbols(), query.symbols())
+    order = branching_order(knowledge, query, symbols)
+
+    # Use a few partitions per worker, so uneven partitions balance out
+    if depth is None:
+        depth = (workers - 1).bit_length() + 3
+    prefix = order[:depth]
+    partitions = [
+        (knowledge, query, prune, dict(zip(prefix, values)))
+        for values in itertools.product([True, False], repeat=len(prefix))
+    ]
+
+    # Leaving the pool terminates any workers still running
+    with multiprocessing.Pool(workers) as pool:
+        for entailed in pool.imap_unordered(check_partition, partitions):
+            if not entailed:
+                return False
+    return True
+
+
+def check_partition(partition):
+    """Checks entailment in the models extending one partial model."""
+    knowledge, query, prune, model = partition
+    return model_check(knowledge, query, prune=prune, model=model)
+
+
+class Solver():
+    """
+    Incremental CDCL satisfiability solver over integer literals.
+    Variables are positive integers, and a literal is a variable
+    or its negation. Clauses learned from conflicts are kept across
+    calls to `solve`, so later queries build on earlier work.
+    """
+
+    def __init__(self):
+        self.values = [0]
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phases = [False]
+        self.watches = dict()
+        self.clauses = []
+        self.learnts = []
+        self.trail = []
+        self.trail_limits = []
+        self.queue_head = 0
+        self.increment = 1.0
+        self.ok = True
+        self.model = None
+        self.conflicts = 0
+        self.decisions = 0
+
+    def new_variable(self):
+        """Adds a fresh variable and returns it."""
+        self.values.append(0)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phases.append(False)
+        variable = len(self.values) - 1
+        self.watches[variable] = []
+        self.watches[-variable] = []
+        return variable
+
+    def value(self, literal):
+        """Returns 1 if literal is true, -1 if false and 0 if unassigned."""
+        value = self.values[abs(literal)]
+        return value if literal > 0 else -value
+
+    def add_clause(self, literals):
+        """
+        Adds a clause to the solver. Returns False if the clauses
+        are now known to be unsatisfiable.
+        """
+        self.backtrack(0)
+        if not self.ok:
+            return False
+        literals = set(literals)
+        clause = []
+        for literal in literals:
+            if -literal in literals or self.value(literal) == 1:
+                return True
+            if self.value(literal) == 0:
+                clause.append(literal)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(clause)
+            self.clauses.append(clause)
+        return self.ok
+
+    def attach(self, clause):
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[variable] = 1 if literal > 0 else -1
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Runs unit propagation over watched literals.
+        Returns a conflicting clause, or None if there is no conflict.
+        """
+        while self.queue_head < len(self.trail):
+            false_literal = -self.trail[self.queue_head]
+            self.queue_head += 1
+            watching = self.watches[false_literal]
+            kept = []
+            for index, clause in enumerate(watching):
+
+                # Keep the false literal in the second watched position
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.value(clause[0]) == 1:
+                    kept.append(clause)
+                    continue
+
+                # Look for another literal to watch
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) != -1:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.value(clause[0]) == -1:
+                        kept.extend(watching[index + 1:])
+                        self.watches[false_literal] = kept
+                        return clause
+                    self.assign(clause[0], clause)
+            self.watches[false_literal] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Derives a learned clause from a conflict by resolving back to
+        the first unique implication point. Returns the clause, with
+        the asserting literal first, and the level to backtrack to.
+        """
+        level = len(self.trail_limits)
+        seen = set()
+        learnt = [None]
+        pending = 0
+        index = len(self.trail) - 1
+        clause = conflict
+        literal = None
+        while True:
+            for other in (clause if literal is None else clause[1:]):
+                variable = abs(other)
+                if variable not in seen and self.levels[variable] > 0:
+                    seen.add(variable)
+                    self.bump(variable)
+                    if self.levels[variable] == level:
+                        pending += 1
+                    else:
+                        learnt.append(other)
+
+            # Walk back along the trail to the next literal to resolve on
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            seen.discard(abs(literal))
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reasons[abs(literal)]
+        learnt[0] = -literal
+
+        # Watch the literal from the highest remaining level second
+        if len(learnt) == 1:
+            return learnt, 0
+        highest = max(range(1, len(learnt)),
+                      key=lambda k: self.levels[abs(learnt[k])])
+        learnt[1], learnt[highest] = learnt[highest], learnt[1]
+        return learnt, self.levels[abs(learnt[1])]
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+
+    def backtrack(self, level):
+        """Undoes all assignments made above decision level `level`."""
+        if len(self.trail_limits) <= level:
+            return
+        limit = self.trail_limits[level]
+        for literal in self.trail[limit:]:
+            variable = abs(literal)
+            self.phases[variable] = literal > 0
+            self.values[variable] = 0
+            self.reasons[variable] = None
+        del self.trail[limit:]
+        del self.trail_limits[level:]
+        self.queue_head = len(self.trail)
+
+    def decide(self):
+        """Returns the unassigned variable with the highest activity."""
+        best = None
+        for variable in range(1, len(self.values)):
+            if self.values[variable] == 0 and (
+                best is None or self.activity[variable] > self.activity[best]
+            ):
+                best = variable
+        return best
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with every literal
+        in `assumptions` true. On success, self.model maps each variable
+        to its value.
+        """
+        self.backtrack(0)
+        self.model = None
+        if not self.ok:
+            return False
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if not self.trail_limits:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.attach(learnt)
+                    self.learnts.append(learnt)
+                    self.assign(learnt[0], learnt)
+                self.increment *= 1.05
+                continue
+
+            # Assumptions are always the first decisions
+            level = len(self.trail_limits)
+            if level < len(assumptions):
+                literal = assumptions[level]
+                if self.value(literal) == -1:
+                    self.backtrack(0)
+                    return False
+                self.trail_limits.append(len(self.trail))
+                if self.value(literal) == 0:
+                    self.assign(literal, None)
+                continue
+
+            variable = self.decide()
+            if variable is None:
+                self.model = {
+                    v: self.values[v] == 1 for v in range(1, len(self.values))
+                }
+                self.backtrack(0)
+                return True
+            self.decisions += 1
+            self.trail_limits.append(len(self.trail))
+            self.assign(variable if self.phases[variable] else -variable, None)
+
+
+class KnowledgeBase():
+    """
+    Incremental knowledge base. Sentences are added one at a time with
+    `tell`, and `ask` checks entailment without starting from scratch:
+    the solver keeps its clauses, learned clauses and heuristics
+    between calls.
+    """
+
+    def __init__(self, *sentences):
+        self.solver = Solver()
+        self.variables = dict()
+        self.literals = dict()
+        for sentence in sentences:
+            self.tell(sentence)
+
+    def literal(self, sentence):
+        """
+        Returns a solver literal equivalent to `sentence`, adding
+        definitions for any subformulas not seen before.
+        """
+        Sentence.validate(sentence)
+        sentence = sentence.freeze()
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        if isinstance(sentence, Symbol):
+            if sentence.name not in self.variables:
+                self.variables[sentence.name] = self.solver.new_variable()
+            literal = self.variables[sentence.name]
+        elif isinstance(sentence, Not):
+            literal = -self.literal(sentence.operand)
+        elif isinstance(sentence, (And, Or)):
+            parts = sentence.conjuncts if isinstance(sentence, And) \
+                else [Not(disjunct) for disjunct in sentence.disjuncts]
+            parts = [self.literal(part) for part in parts]
+            literal = self.solver.new_variable()
+            for part in parts:
+                self.solver.add_clause([-literal, part])
+            self.solver.add_clause([literal] + [-part for part in parts])
+            if isinstance(sentence, Or):
+                literal = -literal
+        elif isinstance(sentence, Implication):
+            literal = self.literal(
+                Or(Not(sentence.antecedent), sentence.consequent)
+            )
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            literal = self.solver.new_variable()
+            self.solver.add_clause([-literal, -left, right])
+            self.solver.add_clause([-literal, left, -right])
+            self.solver.add_clause([literal, left, right])
+            self.solver.add_clause([literal, -left, -right])
+        else:
+            raise TypeError(f"cannot encode {type(sentence).__name__}")
+
+        self.literals[sentence] = literal
+        return literal
+
+    def tell(self, sentence):
+        """Adds `sentence` to the knowledge base."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.tell(conjunct)
+        elif isinstance(sentence, Or):
+            self.solver.add_clause(
+                [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            )
+        else:
+            self.solver.add_clause([self.literal(sentence)])
+
+    def ask(self, query, assumptions=()):
+        """
+        Checks if the knowledge base, together with every sentence in
+        `assumptions`, entails `query`.
+        """
+        literals = [self.literal(assumption) for assumption in assumptions]
+        literals.append(-self.literal(query))
+        return not self.solver.solve(literals)
+
+    def consistent(self, assumptions=()):
+        """Checks if the knowledge base and `assumptions` can all be true."""
+        literals = [self.literal(assumption) for assumption in assumptions]
+        return self.solver.solve(literals)
+
+
+def enumerate_models(knowledge, symbols=()):
+    """
+    Yields every model of the knowledge base, one at a time, as a
+    dictionary from symbol name to truth value. Models assign the symbols
+    of the knowledge base and any extra symbol names in `symbols`.
+    """
+    knowledge_base = KnowledgeBase(knowledge)
+    names = sorted(set().union(knowledge.symbols(), symbols))
+    variables = [knowledge_base.literal(Symbol(name)) for name in names]
+    solver = knowledge_base.solver
+
+    # Each model found is blocked, so the next solve finds a new one
+    while solver.solve():
+        model = {
+            name: solver.model[variable]
+            for name, variable in zip(names, variables)
+        }
+        yield model
+        if not solver.add_clause([
+            -variable if model[name] else variable
+            for name, variable in zip(names, variables)
+        ]):
+            return
+
+
+def count_models(knowledge, symbols=()):
+    """
+    Returns the number of models of the knowledge base over its symbols
+    and any extra symbol names in `symbols`, without enumerating them.
+    Independent parts of the knowledge base are counted separately,
+    and counts of subproblems that recur are remembered.
+    """
+    knowledge_base = KnowledgeBase(knowledge)
+    for name in set().union(knowledge.symbols(), symbols):
+        knowledge_base.literal(Symbol(name))
+    solver = knowledge_base.solver
+    if not solver.ok:
+        return 0
+
+    # Definitions of subformulas fix their variables, so they don't
+    # change the count
+    clauses = [frozenset(clause) for clause in solver.clauses]
+    clauses.extend(frozenset([literal]) for literal in solver.trail)
+    variables = set(range(1, len(solver.values)))
+    return count_clauses(clauses, variables, dict())
+
+
+def count_clauses(clauses, variables, cache):
+    """
+    Returns the number of assignments to `variables` that satisfy
+    every clause, where each clause is a frozenset of literals.
+    """
+    clauses = simplify(clauses)
+    if clauses is None:
+        return 0
+    assigned = {abs(next(iter(c))) for c in clauses if len(c) == 1}
+    clauses = [clause for clause in clauses if len(clause) > 1]
+
+    # Variables that no clause mentions can take either value
+    mentioned = {abs(literal) for clause in clauses for literal in clause}
+    count = 2 ** len(variables - mentioned - assigned)
+
+    for component in components(clauses):
+        key = frozenset(component)
+        if key not in cache:
+            # Branch in the middle of the component, where an assignment
+            # is most likely to split it into independent halves
+            neighbours = dict()
+            for clause in component:
+                for literal in clause:
+                    neighbours.setdefault(abs(literal), set()).update(
+                        abs(other) for other in clause
+                    )
+            variable = centre(neighbours)
+            cache[key] = sum(
+                count_clauses(
+                    component + [frozenset([literal])], set(neighbours), cache
+                )
+                for literal in [variable, -variable]
+            )
+        count *= cache[key]
+        if count == 0:
+            return 0
+    return count
+
+
+def centre(neighbours):
+    """
+    Returns a variable halfway along the longest shortest path found
+    in a graph given as a dictionary from variables to their neighbours.
+    """
+    def distances(start):
+        distance = {start: 0}
+        frontier = [start]
+        while frontier:
+            following = []
+            for variable in frontier:
+                for neighbour in neighbours[variable]:
+                    if neighbour not in distance:
+                        distance[neighbour] = distance[variable] + 1
+                        following.append(neighbour)
+            frontier = following
+        return distance
+
+    # Find a far end of the graph, then the variables halfway across
+    distance = distances(next(iter(neighbours)))
+    end = max(distance, key=distance.get)
+    distance = distances(end)
+    middle = max(distance.values()) // 2
+    return max(
+        (variable for variable in distance if distance[variable] == middle),
+        key=lambda variable: len(neighbours[variable])
+    )
+
+
+def simplify(clauses):
+    """
+    Applies unit propagation to a list of clauses. Returns the
+    remaining clauses together with the unit clauses that were applied,
+    or None if the clauses are contradictory.
+    """
+    units = set()
+    pending = [next(iter(c)) for c in clauses if len(c) == 1]
+    while pending:
+        literal = pending.pop()
+        if -literal in units:
+            return None
+        if literal in units:
+            continue
+        units.add(literal)
+        reduced = []
+        for clause in clauses:
+            if literal in clause:
+                continue
+            if -literal in clause:
+                clause = clause - {-literal}
+                if not clause:
+                    return None
+                if len(clause) == 1:
+                    pending.append(next(iter(clause)))
+            reduced.append(clause)
+        clauses = reduced
+    return clauses + [frozenset([literal]) for literal in units]
+
+
+def components(clauses):
+    """Splits clauses into groups that share no variables."""
+    parent = dict()
+
+    def find(variable):
+        while parent.setdefault(variable, variable) != variable:
+            parent[variable] = parent[parent[variable]]
+            variable = parent[variable]
+        return variable
+
+    for clause in clauses:
+        first = find(abs(next(iter(clause))))
+        for literal in clause:
+            parent[find(abs(literal))] = first
+
+    groups = dict()
+    for clause in clauses:
+        groups.setdefault(find(abs(next(iter(clause)))), []).append(clause)
+    return list(groups.values())
@@ -0,0 +1,203 @@
+import random
+import sys
+import time
+import tracemalloc
+
+from minesweeper import CompactMinesweeperAI, Minesweeper, MinesweeperAI
+from simulate import percentile
+
+MOVES = 2000
+MEMORY_MOVES = 20000
+GAMES = 300
+DENSITY = 0.15
+
+
+def main():
+    benchmarks = {
+        "moves": benchmark_moves,
+        "memory": benchmark_memory,
+        "knowledge": benchmark_knowledge,
+        "linear": benchmark_linear,
+        "flood": benchmark_flood,
+        "generate": benchmark_generate
+    }
+    if len(sys.argv) > 2 or (
+        len(sys.argv) == 2 and sys.argv[1] not in benchmarks
+    ):
+        sys.exit(f"Usage: python benchmark.py [{'|'.join(benchmarks)}]")
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        benchmarks[name]()
+
+
+def play(game, ai, moves):
+    """
+    Let `ai` play up to `moves` moves of `game`, restarting on an
+    unexplored cell after hitting a mine so that the game keeps going.
+    Return the time taken by each call to `add_knowledge`.
+    """
+    times = []
+    for _ in range(moves):
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+            if move is None:
+                break
+        if game.is_mine(move):
+            ai.mark_mine(move)
+            continue
+        count = game.nearby_mines(move)
+        start = time.perf_counter()
+        ai.add_knowledge(move, count)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def benchmark_moves(moves=MOVES):
+    """Time add_knowledge over the first moves of games on large boards."""
+    print(f"add_knowledge over the first {moves} moves")
+    for size in [100, 1000]:
+        for player in [MinesweeperAI, CompactMinesweeperAI]:
+            random.seed(0)
+            game = Minesweeper(size, size, int(DENSITY * size * size))
+            ai = player(size, size)
+            times = play(game, ai, moves)
+            print(f"  {size}x{size} {player.__name__}: {len(times)} moves, "
+                  f"mean {sum(times) / max(len(times), 1) * 1e6:.0f} us, "
+                  f"p99 {percentile(sorted(times), 0.99) * 1e6:.0f} us")
+
+
+def benchmark_memory(moves=MEMORY_MOVES, size=1000):
+    """Measure the memory used by the AI over a game on a large board."""
+    print(f"AI memory over {moves} moves on a {size}x{size} board")
+    for player in [MinesweeperAI, CompactMinesweeperAI]:
+        random.seed(0)
+        game = Minesweeper(size, size, int(DENSITY * size * size))
+        tracemalloc.start()
+        ai = player(size, size)
+        play(game, ai, moves)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {player.__name__}: {current / 2 ** 20:.1f} MiB held, "
+              f"{peak / 2 ** 20:.1f} MiB peak")
+
+
+def benchmark_knowledge(size=300, checkpoints=10):
+    """
+    Follow the size of the knowledge base and the time taken by
+    add_knowledge over a whole game on a large board.
+    """
+    print(f"Knowledge base over a {size}x{size} game")
+    random.seed(0)
+    game = Minesweeper(size, size, int(DENSITY * size * size))
+    ai = CompactMinesweeperAI(size, size)
+    moves = size * size - len(game.mines)
+    for checkpoint in range(checkpoints):
+        times = play(game, ai, moves // checkpoints)
+        if not times:
+            break
+        print(f"  {len(ai.moves_made)} moves: "
+              f"{len(ai.sentences)} sentences with cells, "
+              f"{len(ai.knowledge)} kept, "
+              f"mean {sum(times) / max(len(times), 1) * 1e6:.0f} us, "
+              f"p99 {percentile(sorted(times), 0.99) * 1e6:.0f} us")
+
+
+def benchmark_linear(games=GAMES):
+    """
+    Compare inference by pairs of sentences with linear mode, by how
+    often each has to guess and by the time taken by add_knowledge.
+    """
+    print(f"Pairwise and linear inference over {games} games")
+    for height, width, mines in [(16, 16, 40), (16, 30, 99)]:
+        for linear in [False, True]:
+            won = guesses = 0
+            times = []
+            for seed in range(games):
+                random.seed(seed)
+                game = Minesweeper(height, width, mines)
+                ai = MinesweeperAI(height, width, mines=mines, linear=linear)
+                while len(ai.moves_made) < height * width - mines:
+                    move = ai.make_safe_move()
+                    if move is None:
+                        guesses += 1
+                        move = ai.make_random_move()
+                    if move is None or game.is_mine(move):
+                        break
+                    count = game.nearby_mines(move)
+                    start = time.perf_counter()
+                    ai.add_knowledge(move, count)
+                    times.append(time.perf_counter() - start)
+                else:
+                    won += 1
+            mode = "linear" if linear else "pairwise"
+            print(f"  {height}x{width}/{mines} {mode}: won {won / games:.1%}, "
+                  f"{guesses / games:.2f} guesses per game, "
+                  f"{len(times) / max(guesses, 1):.1f} moves per guess, "
+                  f"mean {sum(times) / max(len(times), 1) * 1e6:.0f} us, "
+                  f"p99 {percentile(sorted(times), 0.99) * 1e6:.0f} us")
+
+
+def benchmark_flood(density=0.05):
+    """
+    Time adding an opening region revealed by flood fill to the AI's
+    knowledge one cell at a time and all at once.
+    """
+    print(f"Adding a flood-filled opening, {density:.0%} mines")
+    for size in [100, 300]:
+        random.seed(0)
+        game = Minesweeper(size, size, int(density * size * size))
+
+        # Open the board at the cell with the largest region
+        region = dict()
+        for cell in random.sample(
+            [(i, j) for i in range(size) for j in range(size)], 50
+        ):
+            if not game.is_mine(cell) and not game.nearby_mines(cell):
+                opened = game.reveal(cell)
+                if len(opened) > len(region):
+                    region = opened
+
+        ai = MinesweeperAI(size, size)
+        start = time.perf_counter()
+        for cell, count in region.items():
+            ai.add_knowledge(cell, count)
+        single = time.perf_counter() - start
+
+        ai = MinesweeperAI(size, size)
+        start = time.perf_counter()
+        ai.add_knowledge_many(region)
+        batch = time.perf_counter() - start
+        print(f"  {size}x{size}: {len(region)} cells, "
+              f"one at a time {single * 1000:.1f} ms, "
+              f"all at once {batch * 1000:.1f} ms")
+
+
+def benchmark_generate(boards=20):
+    """
+    Time placing mines on a large board across densities, and
+    generating boards that can be solved without guessing.
+    """
+    size = 1000
+    print(f"Placing mines on a {size}x{size} board")
+    for density in [0.15, 0.5, 0.9, 0.99]:
+        start = time.perf_counter()
+        Minesweeper(size, size, int(density * size * size), seed=0)
+        print(f"  {density:.0%} mines: "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"Generating {boards} boards solvable without guessing")
+    for height, width, mines in [(9, 9, 10), (16, 16, 40), (16, 30, 99),
+                                 (100, 100, 1500)]:
+        start = time.perf_counter()
+        for seed in range(boards):
+            Minesweeper.without_guessing(
+                height, width, mines, (height // 2, width // 2), seed=seed
+            )
+        elapsed = time.perf_counter() - start
+        print(f"  {height}x{width}/{mines}: "
+              f"{boards / elapsed:.1f} boards per second")
+
+
+if __name__ == "__main__":
+    main()
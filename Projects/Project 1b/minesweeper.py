@@ -1,6 +1,35 @@
+import bisect
 import itertools
+import math
 import random
 import copy
+import time
+from collections.abc import MutableSet
+from fractions import Fraction
+
+# Offsets from a cell to the cells around it
+OFFSETS = [
+    (di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1) if (di, dj) != (0, 0)
+]
+
+
+def neighbours(cell, height, width):
+    """
+    Returns the set of cells within one row and column of `cell`
+    on a board of the given size, not including the cell itself.
+    """
+    i, j = cell
+
+    # Cells away from the edges have all eight neighbours
+    if 0 < i < height - 1 and 0 < j < width - 1:
+        return {
+            (i - 1, j - 1), (i - 1, j), (i - 1, j + 1), (i, j - 1),
+            (i, j + 1), (i + 1, j - 1), (i + 1, j), (i + 1, j + 1)
+        }
+    return {
+        (i + di, j + dj) for di, dj in OFFSETS
+        if 0 <= i + di < height and 0 <= j + dj < width
+    }
 
 
 class Minesweeper():
@@ -8,28 +37,44 @@ class Minesweeper():
     Minesweeper game representation
     """
 
-    def __init__(self, height=8, width=8, mines=8):
+    def __init__(self, height=8, width=8, mines=8, seed=None, exclude=()):
 
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
         self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        # Initialize an empty field with no mines, one byte per cell
+        # stored row by row
+        self.board = bytearray(self.height * self.width)
 
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        # Add mines randomly, at distinct cells not in `exclude`, using
+        # the seed if one is given
+        rng = random if seed is None else random.Random(seed)
+        excluded = sorted({i * width + j for i, j in exclude})
+        free = height * width - len(excluded)
+        if not 0 <= mines <= free:
+            raise ValueError(f"can't place {mines} mines in {free} cells")
+
+        # Sample positions among the cells that aren't excluded, and move
+        # each past the excluded cells that come before it
+        # When most cells are mines, sample the cells without one instead
+        if 2 * mines <= free:
+            indices = rng.sample(range(free), mines)
+        else:
+            empty = set(rng.sample(range(free), free - mines))
+            indices = [
+                position for position in range(free) if position not in empty
+            ]
+        if excluded:
+            shifts = [cell - k for k, cell in enumerate(excluded)]
+            indices = [
+                position + bisect.bisect_right(shifts, position)
+                for position in indices
+            ]
+        for index in indices:
+            self.board[index] = True
+        self.mines = set(map(divmod, indices, itertools.repeat(width)))
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -42,7 +87,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.board[i * self.width + j]:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -51,7 +96,7 @@ class Minesweeper():
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i * self.width + j])
 
     def nearby_mines(self, cell):
         """
@@ -60,23 +105,76 @@ class Minesweeper():
         not including the cell itself.
         """
 
-        # Keep count of nearby mines
-        count = 0
+        # Count mines among the cells within one row and column
+        return sum(
+            self.board[i * self.width + j]
+            for i, j in neighbours(cell, self.height, self.width)
+        )
 
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
+    def reveal(self, cell):
+        """
+        Returns a dictionary from `cell`, which must not be a mine, to
+        its number of nearby mines. If there are none, every neighbour
+        is revealed too, and so on, as a player clicking the cell would
+        see.
+        """
+        counts = dict()
+        queue = [cell]
+        while queue:
+            cell = queue.pop()
+            if cell in counts:
+                continue
+            counts[cell] = self.nearby_mines(cell)
+            if counts[cell] == 0:
+                queue.extend(
+                    neighbour
+                    for neighbour in neighbours(cell, self.height, self.width)
+                    if neighbour not in counts
+                )
+        return counts
 
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
+    @classmethod
+    def without_guessing(cls, height=8, width=8, mines=8, start=(0, 0),
+                         seed=None, attempts=1000):
+        """
+        Returns a game that can be won without guessing by a player who
+        starts by revealing `start`, which is kept clear of mines along
+        with its neighbours. Boards are drawn at random, using the seed if
+        one is given, until the AI solves one or `attempts` run out.
+        """
+        rng = random if seed is None else random.Random(seed)
+        clear = neighbours(start, height, width) | {start}
+        for _ in range(attempts):
+            game = cls(height, width, mines, seed=rng.getrandbits(64),
+                       exclude=clear)
+            if game.solvable(start):
+                return game
+        raise ValueError(
+            f"no board found that can be solved without guessing "
+            f"in {attempts} attempts"
+        )
 
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
+    def solvable(self, start):
+        """
+        Returns whether the AI, revealing `start` and then only cells it
+        knows to be safe, can find where every mine is.
+        """
+        ai = CompactMinesweeperAI(self.height, self.width, linear=True)
+        move = start
+        while move is not None:
+            if self.is_mine(move):
+                return False
+            ai.add_knowledge_many({
+                cell: count for cell, count in self.reveal(move).items()
+                if cell not in ai.moves_made
+            })
+            move = ai.make_safe_move()
 
-        return count
+        # Once no safe move is known, the number of mines left may still
+        # settle the cells that remain
+        unknown = self.height * self.width - len(ai.safes) - len(ai.mines)
+        left = len(self.mines) - len(ai.mines)
+        return left == 0 or left == unknown
 
     def won(self):
         """
@@ -92,6 +190,8 @@ class Sentence():
     and a count of the number of those cells which are mines.
     """
 
+    __slots__ = ("cells", "count")
+
     def __init__(self, cells, count):
         self.cells = set(cells)
         self.count = count
@@ -102,6 +202,13 @@ class Sentence():
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def key(self):
+        """
+        Returns a hashable value that is the same for sentences that
+        are equal.
+        """
+        return frozenset(self.cells), self.count
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
@@ -138,16 +245,183 @@ class Sentence():
             pass
 
 
+class CellBits():
+    """
+    Set of board cells stored as the bits of an integer, where the cell
+    (i, j) is bit i * width + j. Only bits from the lowest cell in the set
+    are kept, so a set of neighbouring cells takes a few hundred bits
+    however large the board is.
+    """
+
+    __slots__ = ("width", "base", "bits")
+
+    def __init__(self, cells, width):
+        self.width = width
+        self.base = 0
+        self.bits = 0
+        ids = [i * width + j for i, j in cells]
+        if ids:
+            self.base = min(ids)
+            for index in ids:
+                self.bits |= 1 << (index - self.base)
+
+    def normalize(self):
+        """
+        Moves the base up to the lowest cell in the set.
+        """
+        if not self.bits:
+            self.base = 0
+            return
+        shift = (self.bits & -self.bits).bit_length() - 1
+        self.bits >>= shift
+        self.base += shift
+
+    def aligned(self, other):
+        """
+        Returns the bits of both sets measured from the lower base,
+        together with that base.
+        """
+        base = min(self.base, other.base)
+        return (self.bits << (self.base - base),
+                other.bits << (other.base - base), base)
+
+    def __contains__(self, cell):
+        i, j = cell
+        offset = i * self.width + j - self.base
+        return offset >= 0 and bool(self.bits >> offset & 1)
+
+    def __iter__(self):
+        bits = self.bits
+        while bits:
+            low = bits & -bits
+            yield divmod(self.base + low.bit_length() - 1, self.width)
+            bits ^= low
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def __eq__(self, other):
+        if isinstance(other, CellBits):
+            return self.base == other.base and self.bits == other.bits
+        return set(self) == other
+
+    def __le__(self, other):
+        if not self.bits:
+            return True
+        if self.base < other.base:
+            return False
+        return (self.bits << (self.base - other.base)) & ~other.bits == 0
+
+    def __isub__(self, other):
+        mine, theirs, self.base = self.aligned(other)
+        self.bits = mine & ~theirs
+        self.normalize()
+        return self
+
+    def clear(self):
+        self.base = 0
+        self.bits = 0
+
+    def remove(self, cell):
+        if cell not in self:
+            raise KeyError(cell)
+        i, j = cell
+        self.bits &= ~(1 << (i * self.width + j - self.base))
+        self.normalize()
+
+    def __str__(self):
+        return str(set(self))
+
+
+class CompactSentence(Sentence):
+    """
+    Sentence whose cells are stored as a CellBits set.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, cells, count, width):
+        self.cells = CellBits(cells, width)
+        self.count = count
+
+    def key(self):
+        return self.cells.base, self.cells.bits, self.count
+
+
+class BoardSet(MutableSet):
+    """
+    Set of board cells stored as one bit flag in a shared bytearray
+    with a byte per cell, so membership is a single lookup.
+    """
+
+    def __init__(self, state, flag, width):
+        self.state = state
+        self.flag = flag
+        self.width = width
+        self.size = 0
+
+        # Translation turning bytes with the flag set into 1, others into 0
+        self.table = bytes(int(bool(byte & flag)) for byte in range(256))
+
+    @classmethod
+    def _from_iterable(cls, cells):
+        return set(cells)
+
+    def __contains__(self, cell):
+        i, j = cell
+        return (0 <= j < self.width and 0 <= i * self.width + j < len(self.state)
+                and bool(self.state[i * self.width + j] & self.flag))
+
+    def __iter__(self):
+        marked = self.state.translate(self.table)
+        index = marked.find(1)
+        while index != -1:
+            yield divmod(index, self.width)
+            index = marked.find(1, index + 1)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, cell):
+        i, j = cell
+        index = i * self.width + j
+        if not self.state[index] & self.flag:
+            self.state[index] |= self.flag
+            self.size += 1
+
+    def discard(self, cell):
+        if cell in self:
+            i, j = cell
+            self.state[i * self.width + j] &= ~self.flag
+            self.size -= 1
+
+    def copy(self):
+        return set(self)
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, time_budget=0.5,
+                 linear=False):
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines on the board, if known, and the time
+        # allowed for working out mine probabilities before a guess
+        self.total_mines = mines
+        self.time_budget = time_budget
+
+        # Whether to solve sentences as linear equations once comparing
+        # them in pairs concludes nothing more
+        self.linear = linear
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -158,14 +432,30 @@ class MinesweeperAI():
         # List of sentences about the game known to be true
         self.knowledge = []
 
+        # Sentences that contain each cell, and sentences
+        # that changed and still need to be re-examined
+        self.index = dict()
+        self.pending = []
+        self.compacted = 0
+
+        # Sentences that still contain cells, by content, so that a
+        # sentence equal to one already known can be dropped
+        self.sentences = dict()
+
+        # Solutions of constraint components, kept between guesses
+        self.solutions = dict()
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        for sentence in self.index.pop(cell, []):
+            self.forget(sentence)
             sentence.mark_mine(cell)
+            self.remember(sentence)
+            self.pending.append(sentence)
 
     def mark_safe(self, cell):
         """
@@ -173,8 +463,71 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        for sentence in self.index.pop(cell, []):
+            self.forget(sentence)
             sentence.mark_safe(cell)
+            self.remember(sentence)
+            self.pending.append(sentence)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base and queues it
+        to be examined by `infer`, unless an equal sentence
+        is already known.
+        """
+        if not sentence.cells or not self.remember(sentence):
+            return
+        self.knowledge.append(sentence)
+        for cell in sentence.cells:
+            self.index.setdefault(cell, []).append(sentence)
+        self.pending.append(sentence)
+
+    def remove_cells(self, sentence, other):
+        """
+        Removes the cells of `other`, a subset of `sentence`,
+        from `sentence`, since the mines among them are already
+        accounted for by `other`.
+        """
+        self.forget(sentence)
+        self.unindex(sentence, other.cells)
+        sentence.cells -= other.cells
+        sentence.count -= other.count
+        self.remember(sentence)
+        self.pending.append(sentence)
+
+    def unindex(self, sentence, cells):
+        """
+        Removes `sentence` from the index entries of `cells`.
+        """
+        # Sentences compare equal by content, so remove by identity
+        for cell in cells:
+            if cell in self.index:
+                self.index[cell] = [
+                    entry for entry in self.index[cell]
+                    if entry is not sentence
+                ]
+
+    def remember(self, sentence):
+        """
+        Records a sentence under its content. If an equal sentence is
+        already known, empties this one instead and returns False.
+        """
+        if not sentence.cells:
+            return True
+        if self.sentences.setdefault(sentence.key(), sentence) is sentence:
+            return True
+        self.unindex(sentence, sentence.cells)
+        sentence.cells.clear()
+        sentence.count = 0
+        return False
+
+    def forget(self, sentence):
+        """
+        Removes the record of a sentence's content before it changes.
+        """
+        key = sentence.key()
+        if self.sentences.get(key) is sentence:
+            del self.sentences[key]
 
     def add_knowledge(self, cell, count):
         """
@@ -191,76 +544,151 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
+        self.add_knowledge_many({cell: count})
 
-        # Mark the cell as one of the moves made in the game
-        self.moves_made.add(cell)
+    def add_knowledge_many(self, counts):
+        """
+        Adds what is known about several safe cells at once, given a
+        dictionary from each cell to its number of neighboring mines,
+        such as a region revealed by Minesweeper.reveal. Inference is
+        only run once, after all of the cells have been added.
+        """
+        # Mark the cells as moves made and as safe, updating any sentences
+        # that contain them, before the cells' own sentences are added
+        for cell in counts:
+            self.moves_made.add(cell)
+            self.mark_safe(cell)
+
+        for cell, count in counts.items():
+            self.add_cell_sentence(cell, count)
 
-        # Mark the cell as a safe cell, updating any sequences that contain the cell as well
-        self.mark_safe(cell)
+        self.infer()
 
+    def add_cell_sentence(self, cell, count):
+        """
+        Adds the sentence saying that `count` of the neighbours
+        of `cell` are mines, leaving out neighbours already known.
+        """
         # Add new sentence to AI knowledge base based on value of cell and count
         cells = set()
         close_cells = self.return_neighbours(cell)  # returns neighbour cells
         for cl in close_cells:
             if cl in self.mines:
                 count -= 1
-            if cl not in self.mines | self.safes:
+            elif cl not in self.safes:
                 # Only add cells that are of unknown state
                 cells.add(cl)
+        if cells:
+            self.add_sentence(Sentence(cells, count))
+
+    def infer(self):
+        """
+        Draws conclusions from the sentences that changed until nothing
+        more can be concluded. Only sentences sharing a cell with a changed
+        sentence are looked at, so the work done depends on how much of
+        the knowledge base changed rather than on its size.
+
+        In linear mode, the sentences linked to the changed ones are
+        then solved together by `eliminate`, and inference carries on
+        until that concludes nothing either.
+        """
+        changed = set()
+        while self.pending or (
+            self.linear and changed and self.eliminate(changed)
+        ):
+            if not self.pending:
+                changed = set()
+                continue
+            sentence = self.pending.pop()
+            if not sentence.cells:
+                continue
+            if self.linear:
+                changed.update(sentence.cells)
+
+            # Mark cells whose state the sentence determines
+            mines = sentence.known_mines()
+            safes = sentence.known_safes()
+            if mines:
+                for mine in list(mines):
+                    self.mark_mine(mine)
+                continue
+            if safes:
+                for safe in list(safes):
+                    self.mark_safe(safe)
+                continue
+
+            # A larger sentence containing this one contains all of its
+            # cells, so it is found in the shortest of their index entries
+            size = len(sentence.cells)
+            entries = [self.index[cell] for cell in sentence.cells]
+            for other in min(entries, key=len):
+                if len(other.cells) > size and sentence.cells <= other.cells:
+                    self.remove_cells(other, sentence)
+
+            # A smaller sentence inside this one shares a cell with it
+            for other in itertools.chain.from_iterable(entries):
+                if len(other.cells) < size and other.cells <= sentence.cells:
+                    self.remove_cells(sentence, other)
+                    break
+
+        # Drop sentences that no longer say anything, once enough of them
+        # have built up for it to be worth a pass over the knowledge base
+        if len(self.knowledge) > 2 * self.compacted + 8:
+            self.knowledge = [s for s in self.knowledge if s.cells]
+            self.compacted = len(self.knowledge)
+
+    def eliminate(self, cells):
+        """
+        Treats the sentences linked to `cells` by shared cells as linear
+        equations, one variable per cell, and reduces them by Gaussian
+        elimination. A reduced equation whose count can only be reached
+        by setting every variable to its lowest or highest value fixes
+        all of its cells. Marks those cells, and returns whether any
+        were found.
+        """
+        # Collect the sentences linked to the changed cells
+        sentences = dict()
+        queue = [cell for cell in cells if cell in self.index]
+        seen = set(queue)
+        while queue:
+            for sentence in self.index[queue.pop()]:
+                if id(sentence) not in sentences:
+                    sentences[id(sentence)] = sentence
+                    for cell in sentence.cells:
+                        if cell not in seen:
+                            seen.add(cell)
+                            queue.append(cell)
+
+        # Reduce the equations, with each row a dictionary from cell to
+        # coefficient together with the count
+        rows = reduce_rows(
+            ({cell: Fraction(1) for cell in sentence.cells},
+             Fraction(sentence.count))
+            for sentence in sentences.values()
+        )
 
-        # Prepare new sentence
-        new_sentence = Sentence(cells, count)
-
-        if len(new_sentence.cells) > 0:
-            # Add that sentence to knowledge only if it is not empty
-            self.knowledge.append(new_sentence)
-
-        # Check sentences for new cells that could be marked as safe or as mine
-        # Create copies of mines and safes
-        mines_copy = self.mines.copy()
-        safes_copy = self.safes.copy()
-        # Iterates through sentences
-        for sentence in self.knowledge.copy():
-            if len(sentence.cells) == 0:
-                self.knowledge.remove(sentence)
-            else:
-                mines = sentence.known_mines()
-                safes = sentence.known_safes()
-                if mines is not None:
-                    for mine in mines:
-                        mines_copy.add(mine)
-
-                if safes is not None:
-                    for safe in safes:
-                        safes_copy.add(safe)
-
-    # Update self.mines and self.safes with the copies
-        self.mines = mines_copy
-        self.safes = safes_copy
-        for sentence1 in self.knowledge:
-            for sentence2 in self.knowledge:
-                if sentence1.cells.issubset(sentence2.cells):
-                    new_cells = sentence2.cells - sentence1.cells
-                    new_count = sentence2.count - sentence1.count
-                    new_sentence = Sentence(new_cells, new_count)
-                    mines = new_sentence.known_mines()
-                    safes = new_sentence.known_safes()
-                    if mines is not None:
-                        for mine in mines:
-                            self.mark_mine(mine)
-
-                    if safes is not None:
-                        for safe in safes:
-                            self.mark_safe(safe)
+        # Cells are 0 or 1, so each row sums to between the total of its
+        # negative and the total of its positive coefficients
+        mines = set()
+        safes = set()
+        for row, count in rows:
+            low = sum(c for c in row.values() if c < 0)
+            high = sum(c for c in row.values() if c > 0)
+            if count == low:
+                mines.update(cell for cell, c in row.items() if c < 0)
+                safes.update(cell for cell, c in row.items() if c > 0)
+            elif count == high:
+                mines.update(cell for cell, c in row.items() if c > 0)
+                safes.update(cell for cell, c in row.items() if c < 0)
+        for cell in mines:
+            self.mark_mine(cell)
+        for cell in safes:
+            self.mark_safe(cell)
+        return bool(mines or safes)
 
     def return_neighbours(self, cell):
         # Returns cells close to arg cell by 1 cell
-        neighbours = set()
-        for rows in range(self.height):
-            for columns in range(self.width):
-                if abs(cell[0] - rows) <= 1 and abs(cell[1] - columns) <= 1 and (rows, columns) != cell:
-                    neighbours.add((rows, columns))
-        return neighbours
+        return neighbours(cell, self.height, self.width)
 
     def make_safe_move(self):
         """
@@ -280,14 +708,351 @@ class MinesweeperAI():
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Should choose among cells that:
         1) have not already been chosen, and
         2) are not known to be mines
+        If the number of mines is known, the cell least likely to be a
+        mine is chosen. Otherwise, or if the probabilities can't be worked
+        out in time, the cell is chosen at random.
+        """
+        probabilities = self.mine_probabilities()
+        if probabilities is None:
+            return self.random_unexplored()
+
+        # Any cell off the frontier is as likely as any other to be a mine
+        frontier, background = probabilities
+        candidates = list(frontier.items())
+        other = self.random_unexplored(exclude=frontier)
+        if other is not None:
+            candidates.append((other, background))
+        if not candidates:
+            return None
+        safest = min(probability for _, probability in candidates)
+        return random.choice([
+            cell for cell, probability in candidates
+            if probability <= safest + 1e-12
+        ])
+
+    def random_unexplored(self, exclude=()):
+        """
+        Returns a random cell that has not been chosen, is not known
+        to be a mine and is not in `exclude`, or None if there is none.
         """
         # Create a list of unexplored cells
-        unexplored_cells = [(row, col) for row in range(self.height) for col in range(self.width) if
-                            (row, col) not in self.moves_made | self.mines]
+        unexplored_cells = [
+            (row, col) for row in range(self.height) for col in range(self.width)
+            if (row, col) not in self.moves_made and (row, col) not in self.mines
+            and (row, col) not in exclude
+        ]
         if unexplored_cells:
             # Return a random cell from the list
             return random.choice(unexplored_cells)
         return None
+
+    def mine_probabilities(self):
+        """
+        Returns the probability that each cell in a sentence is a mine,
+        as a dictionary, together with the probability for any other
+        unexplored cell. Returns None if the total number of mines
+        isn't known, or if the time budget runs out.
+
+        Sentences that share no cells are solved separately, and their
+        solutions combined using the number of mines left on the board.
+        """
+        if self.total_mines is None:
+            return None
+        deadline = time.perf_counter() + self.time_budget
+
+        # Group sentences that are linked by shared cells
+        parent = dict()
+
+        def find(cell):
+            while parent.setdefault(cell, cell) != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        sentences = [s for s in self.knowledge if s.cells]
+        for sentence in sentences:
+            first = find(next(iter(sentence.cells)))
+            for cell in sentence.cells:
+                parent[find(cell)] = first
+        groups = dict()
+        for sentence in sentences:
+            groups.setdefault(
+                find(next(iter(sentence.cells))), []
+            ).append(sentence)
+
+        # Count solutions of each group by number of mines, keeping only
+        # the solutions of groups that are still there
+        live = dict()
+        for group in groups.values():
+            key = frozenset(sentence.key() for sentence in group)
+            if key not in self.solutions:
+                solutions = count_solutions(group, deadline)
+                if solutions is None:
+                    return None
+                self.solutions[key] = solutions
+            live[key] = self.solutions[key]
+        self.solutions = live
+        components = list(live.values())
+
+        # Combine the components, weighting each total number of mines by
+        # the ways the remaining mines fit in the unconstrained cells
+        unconstrained = (self.height * self.width - len(self.safes)
+                         - len(self.mines) - len(parent))
+        remaining = self.total_mines - len(self.mines)
+
+        def log_weight(mines):
+            rest = remaining - mines
+            if rest < 0 or rest > unconstrained:
+                return -math.inf
+            return (math.lgamma(unconstrained + 1) - math.lgamma(rest + 1)
+                    - math.lgamma(unconstrained - rest + 1))
+
+        # Keep the product of the components before each one, and build
+        # the product of those after it going backwards, so the other
+        # components of each take one convolution
+        prefixes = [[1]]
+        for totals, _ in components:
+            if time.perf_counter() > deadline:
+                return None
+            prefixes.append(convolve(prefixes[-1], totals))
+        total = prefixes[-1]
+        normal = log_total(total, log_weight)
+        if normal == -math.inf:
+            return None
+
+        probabilities = dict()
+        suffix = [1]
+        for index in reversed(range(len(components))):
+            if time.perf_counter() > deadline:
+                return None
+            totals, cells = components[index]
+            others = convolve(prefixes[index], suffix)
+            for cell, counts in cells.items():
+                probabilities[cell] = math.exp(
+                    log_total(convolve(others, counts), log_weight) - normal
+                )
+            suffix = convolve(suffix, totals)
+
+        # Mines not placed on the frontier are spread over the other cells
+        background = 1.0
+        if unconstrained:
+            expected = math.exp(log_total(
+                [count * max(remaining - mines, 0)
+                 for mines, count in enumerate(total)], log_weight
+            ) - normal)
+            background = expected / unconstrained
+        return probabilities, background
+
+
+class CompactMinesweeperAI(MinesweeperAI):
+    """
+    Minesweeper game player for large boards. It behaves like
+    MinesweeperAI, but keeps the state of every cell in a bytearray and
+    stores sentences as bitsets, so memory grows by about a byte per cell.
+    """
+
+    MADE = 1
+    MINE = 2
+    SAFE = 4
+
+    def __init__(self, height=8, width=8, mines=None, time_budget=0.5,
+                 linear=False):
+        super().__init__(height, width, mines, time_budget, linear)
+
+        # One byte per cell, holding which of the sets below it is in
+        self.state = bytearray(height * width)
+        self.moves_made = BoardSet(self.state, self.MADE, width)
+        self.mines = BoardSet(self.state, self.MINE, width)
+        self.safes = BoardSet(self.state, self.SAFE, width)
+
+        # Cells marked safe, some of which may not have been chosen yet
+        self.unmade = []
+
+        # Translation turning unexplored cells into 1, others into 0
+        known = self.MADE | self.MINE
+        self.unexplored = bytes(int(not byte & known) for byte in range(256))
+
+    def mark_safe(self, cell):
+        if cell not in self.safes:
+            self.unmade.append(cell)
+        super().mark_safe(cell)
+
+    def add_sentence(self, sentence):
+        super().add_sentence(
+            CompactSentence(sentence.cells, sentence.count, self.width)
+        )
+
+    def make_safe_move(self):
+        # Drop cells that have been chosen since they were marked safe
+        while self.unmade and self.unmade[-1] in self.moves_made:
+            self.unmade.pop()
+        if self.unmade:
+            return self.unmade[-1]
+        return None
+
+    def random_unexplored(self, exclude=()):
+        # Sample cells at random while unexplored cells are common
+        known = self.MADE | self.MINE
+        for _ in range(32):
+            index = random.randrange(len(self.state))
+            cell = divmod(index, self.width)
+            if not self.state[index] & known and cell not in exclude:
+                return cell
+
+        # Otherwise, list the unexplored cells
+        marked = self.state.translate(self.unexplored)
+        unexplored_cells = []
+        index = marked.find(1)
+        while index != -1:
+            cell = divmod(index, self.width)
+            if cell not in exclude:
+                unexplored_cells.append(cell)
+            index = marked.find(1, index + 1)
+        if unexplored_cells:
+            return random.choice(unexplored_cells)
+        return None
+
+
+def reduce_rows(rows):
+    """
+    Puts the linear equations in `rows`, each a dictionary from variable
+    to coefficient and a right-hand side, in reduced row echelon form.
+    Returns the rows that still have variables.
+    """
+    reduced = []
+    pivots = dict()
+    for row, value in rows:
+        row = dict(row)
+
+        # Eliminate the pivot variables of the rows reduced so far
+        for variable in [v for v in row if v in pivots]:
+            factor = row.get(variable)
+            if factor:
+                value -= factor * subtract(row, pivots[variable], factor)
+        if not row:
+            continue
+
+        # Pivot on a variable of this row, and remove it from the others
+        variable = next(iter(row))
+        factor = row[variable]
+        for v in row:
+            row[v] /= factor
+        value /= factor
+        entry = [row, value]
+        for other in reduced:
+            coefficient = other[0].get(variable)
+            if coefficient:
+                other[1] -= coefficient * subtract(other[0], entry, coefficient)
+        pivots[variable] = entry
+        reduced.append(entry)
+    return [(row, value) for row, value in reduced if row]
+
+
+def subtract(row, entry, factor):
+    """
+    Subtracts `factor` times the equation `entry` from the coefficients
+    in `row`, dropping any that become zero. Returns the right-hand side
+    of `entry`, to be scaled and subtracted by the caller.
+    """
+    for variable, coefficient in entry[0].items():
+        result = row.get(variable, 0) - factor * coefficient
+        if result:
+            row[variable] = result
+        else:
+            row.pop(variable, None)
+    return entry[1]
+
+
+def count_solutions(sentences, deadline):
+    """
+    Enumerates every way to place mines in the cells of `sentences`
+    consistent with all of them. Returns a list whose k-th entry is the
+    number of solutions with k mines, and a dictionary from each cell to
+    the same list counting only solutions where that cell is a mine.
+    Returns None if `deadline` passes first.
+    """
+    # Assign cells sentence by sentence, so constraints fail early
+    cells = []
+    for sentence in sentences:
+        for cell in sentence.cells:
+            if cell not in cells:
+                cells.append(cell)
+    needed = [sentence.count for sentence in sentences]
+    unassigned = [len(sentence.cells) for sentence in sentences]
+    constraints = {cell: [] for cell in cells}
+    for index, sentence in enumerate(sentences):
+        for cell in sentence.cells:
+            constraints[cell].append(index)
+
+    totals = [0] * (len(cells) + 1)
+    counts = {cell: [0] * (len(cells) + 1) for cell in cells}
+    placed = []
+    visited = 0
+
+    def place(position):
+        nonlocal visited
+        visited += 1
+        if visited % 1024 == 0 and time.perf_counter() > deadline:
+            return False
+        if position == len(cells):
+            totals[len(placed)] += 1
+            for cell in placed:
+                counts[cell][len(placed)] += 1
+            return True
+        cell = cells[position]
+        for mine in (0, 1):
+
+            # Each sentence must still be able to reach its count
+            if all(0 <= needed[i] - mine <= unassigned[i] - 1
+                   for i in constraints[cell]):
+                for i in constraints[cell]:
+                    needed[i] -= mine
+                    unassigned[i] -= 1
+                if mine:
+                    placed.append(cell)
+                finished = place(position + 1)
+                if mine:
+                    placed.pop()
+                for i in constraints[cell]:
+                    needed[i] += mine
+                    unassigned[i] += 1
+                if not finished:
+                    return False
+        return True
+
+    if not place(0):
+        return None
+    return totals, counts
+
+
+def convolve(first, second):
+    """Returns the distribution of the sum of two counts of mines."""
+    result = [0] * (len(first) + len(second) - 1)
+    for i, a in enumerate(first):
+        if a:
+            for j, b in enumerate(second):
+                result[i + j] += a * b
+
+    # Numbers of mines no solution has don't need to be carried along
+    while len(result) > 1 and not result[-1]:
+        result.pop()
+    return result
+
+
+def log_total(counts, log_weight):
+    """
+    Returns the logarithm of the sum of counts[k] * exp(log_weight(k)),
+    or minus infinity if the sum is zero.
+    """
+    terms = [
+        math.log(count) + log_weight(k)
+        for k, count in enumerate(counts) if count > 0
+    ]
+    terms = [term for term in terms if term > -math.inf]
+    if not terms:
+        return -math.inf
+    top = max(terms)
+    return top + math.log(sum(math.exp(term - top) for term in terms))
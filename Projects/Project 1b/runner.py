@@ -1,22 +1,39 @@
 import pygame
+import queue
 import sys
-import time
+import threading
 
-from minesweeper import Minesweeper, MinesweeperAI
+from minesweeper import CompactMinesweeperAI, Minesweeper, MinesweeperAI
 
 HEIGHT = 8
 WIDTH = 8
 MINES = 8
 
+# Board size and number of mines can be given on the command line
+if len(sys.argv) not in [1, 4] or not all(arg.isdigit() for arg in sys.argv[1:]):
+    sys.exit("Usage: python runner.py [height width mines]")
+if len(sys.argv) == 4:
+    HEIGHT, WIDTH, MINES = (int(arg) for arg in sys.argv[1:])
+
+# Large boards use the AI that keeps its state in a bytearray
+AI = CompactMinesweeperAI if HEIGHT * WIDTH > 10000 else MinesweeperAI
+
 # Colors
 BLACK = (0, 0, 0)
 GRAY = (180, 180, 180)
 WHITE = (255, 255, 255)
 
+# Highest frame rate to draw at
+FPS = 60
+
+# Event posted by the AI thread when it has chosen a move
+AI_MOVE = pygame.USEREVENT + 1
+
 # Create game
 pygame.init()
 size = width, height = 600, 400
 screen = pygame.display.set_mode(size)
+clock = pygame.time.Clock()
 
 # Fonts
 OPEN_SANS = "assets/fonts/OpenSans-Regular.ttf"
@@ -29,7 +46,11 @@ BOARD_PADDING = 20
 board_width = ((2 / 3) * width) - (BOARD_PADDING * 2)
 board_height = height - (BOARD_PADDING * 2)
 cell_size = int(min(board_width / WIDTH, board_height / HEIGHT))
+if cell_size < 1:
+    sys.exit(f"Boards can be at most {int(board_width)} cells wide "
+             f"and {int(board_height)} cells tall")
 board_origin = (BOARD_PADDING, BOARD_PADDING)
+board = pygame.Rect(board_origin, (WIDTH * cell_size, HEIGHT * cell_size))
 
 # Add images
 flag = pygame.image.load("assets/images/flag.png")
@@ -37,29 +58,184 @@ flag = pygame.transform.scale(flag, (cell_size, cell_size))
 mine = pygame.image.load("assets/images/mine.png")
 mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
-# Create game and AI agent
-game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+# Cell borders and numbers of nearby mines shrink with the cells, and
+# are left out when cells are too small for them; revealed cells are
+# then told apart by their color
+border = min(3, cell_size // 5)
+numberSize = min(20, int(cell_size / 1.4))
+if numberSize >= 6:
+    numberFont = pygame.font.Font(OPEN_SANS, numberSize)
+    numbers = [numberFont.render(str(n), True, BLACK) for n in range(9)]
+else:
+    numbers = None
+
+# Buttons and the area of the screen beside the board
+sidebar = pygame.Rect((2 / 3) * width, 0, width / 3, height)
+aiButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+resetButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+
+
+def think(requests):
+    """
+    Run the AI on its own thread, so the window keeps responding while
+    it works. Each request is a game number with a dictionary from
+    revealed cells to their numbers of nearby mines, to add to the AI's
+    knowledge, or with None to ask for a move. Moves are posted back to
+    the main loop as AI_MOVE events.
+    """
+    ai = None
+    current = None
+    while True:
+        number, counts = requests.get()
+        if number != current:
+            ai = AI(height=HEIGHT, width=WIDTH, mines=MINES)
+            current = number
+        if counts is not None:
+            ai.add_knowledge_many(counts)
+            continue
+        move = ai.make_safe_move()
+        safe = move is not None
+        if move is None:
+            move = ai.make_random_move()
+        pygame.event.post(pygame.event.Event(
+            AI_MOVE, game=number, move=move, safe=safe,
+            mines=set(ai.mines) if move is None else None
+        ))
+
+
+def cell_rect(cell):
+    """Return the rectangle of the screen where `cell` is drawn."""
+    i, j = cell
+    return pygame.Rect(
+        board_origin[0] + j * cell_size,
+        board_origin[1] + i * cell_size,
+        cell_size, cell_size
+    )
+
+
+def cell_at(position):
+    """Return the cell drawn at `position`, or None if there is none."""
+    if not board.collidepoint(position):
+        return None
+    return ((position[1] - board_origin[1]) // cell_size,
+            (position[0] - board_origin[0]) // cell_size)
+
+
+def draw_cell(cell):
+    """Draw `cell` as it is now, and return its rectangle."""
+    rect = cell_rect(cell)
+    shown = cell in revealed and numbers is None
+    pygame.draw.rect(screen, WHITE if shown else GRAY, rect)
+    if border:
+        pygame.draw.rect(screen, WHITE, rect, border)
+
+    # Add a mine, flag, or number if needed
+    if game.is_mine(cell) and lost:
+        screen.blit(mine, rect)
+    elif cell in flags:
+        screen.blit(flag, rect)
+    elif cell in revealed and numbers is not None:
+        neighbors = numbers[game.nearby_mines(cell)]
+        neighborsTextRect = neighbors.get_rect()
+        neighborsTextRect.center = rect.center
+        screen.blit(neighbors, neighborsTextRect)
+    return rect
+
+
+def draw_sidebar():
+    """Draw the buttons, game status and frame rate beside the board."""
+    pygame.draw.rect(screen, BLACK, sidebar)
+
+    # AI Move button
+    buttonText = mediumFont.render("AI Move", True, BLACK)
+    buttonRect = buttonText.get_rect()
+    buttonRect.center = aiButton.center
+    pygame.draw.rect(screen, GRAY if thinking else WHITE, aiButton)
+    screen.blit(buttonText, buttonRect)
+
+    # Reset button
+    buttonText = mediumFont.render("Reset", True, BLACK)
+    buttonRect = buttonText.get_rect()
+    buttonRect.center = resetButton.center
+    pygame.draw.rect(screen, WHITE, resetButton)
+    screen.blit(buttonText, buttonRect)
+
+    # Display text
+    text = "Lost" if lost else "Won" if game.mines == flags else ""
+    text = mediumFont.render(text, True, WHITE)
+    textRect = text.get_rect()
+    textRect.center = ((5 / 6) * width, (2 / 3) * height)
+    screen.blit(text, textRect)
+
+    # Display frame rate
+    text = smallFont.render(f"{clock.get_fps():.0f} FPS", True, GRAY)
+    textRect = text.get_rect()
+    textRect.center = ((5 / 6) * width, height - BOARD_PADDING * 2)
+    screen.blit(text, textRect)
+    return sidebar
+
+
+def reset():
+    """Start a new game, with a new AI on the AI thread."""
+    global game, number, revealed, flags, lost, thinking, redraw
+    game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
+    number += 1
+    revealed = set()
+    flags = set()
+    lost = False
+    thinking = False
+    redraw = True
 
-# Keep track of revealed cells, flagged cells, and if a mine was hit
-revealed = set()
-flags = set()
-lost = False
+
+# Start the AI thread, which holds the AI agent
+requests = queue.Queue()
+threading.Thread(target=think, args=(requests,), daemon=True).start()
+
+# Create game; the game number tells the AI thread which game it is in
+number = 0
+reset()
+
+# Cells that have changed since they were last drawn
+dirty = set()
 
 # Show instructions initially
 instructions = True
 
 while True:
+    clock.tick(FPS)
 
-    # Check if game quit
+    # Check if game quit, and collect clicks and moves from the AI
+    clicks = []
+    move = None
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             sys.exit()
-
-    screen.fill(BLACK)
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            clicks.append((event.button, event.pos))
+        elif event.type == AI_MOVE and event.game == number:
+            thinking = False
+            if event.move in revealed:
+                continue
+            if event.move is None:
+                dirty |= flags ^ event.mines
+                flags = event.mines
+                print("No moves left to make.")
+            elif event.safe:
+                print("AI making safe move.")
+                move = event.move
+            else:
+                print("No known safe moves, AI making random move.")
+                move = event.move
 
     # Show game instructions
     if instructions:
+        screen.fill(BLACK)
 
         # Title
         title = largeFont.render("Play Minesweeper", True, WHITE)
@@ -88,135 +264,69 @@ while True:
         screen.blit(buttonText, buttonTextRect)
 
         # Check if play button clicked
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1:
-            mouse = pygame.mouse.get_pos()
-            if buttonRect.collidepoint(mouse):
+        for button, mouse in clicks:
+            if button == 1 and buttonRect.collidepoint(mouse):
                 instructions = False
-                time.sleep(0.3)
+                redraw = True
 
         pygame.display.flip()
         continue
 
-    # Draw board
-    cells = []
-    for i in range(HEIGHT):
-        row = []
-        for j in range(WIDTH):
-
-            # Draw rectangle for cell
-            rect = pygame.Rect(
-                board_origin[0] + j * cell_size,
-                board_origin[1] + i * cell_size,
-                cell_size, cell_size
-            )
-            pygame.draw.rect(screen, GRAY, rect)
-            pygame.draw.rect(screen, WHITE, rect, 3)
-
-            # Add a mine, flag, or number if needed
-            if game.is_mine((i, j)) and lost:
-                screen.blit(mine, rect)
-            elif (i, j) in flags:
-                screen.blit(flag, rect)
-            elif (i, j) in revealed:
-                neighbors = smallFont.render(
-                    str(game.nearby_mines((i, j))),
-                    True, BLACK
-                )
-                neighborsTextRect = neighbors.get_rect()
-                neighborsTextRect.center = rect.center
-                screen.blit(neighbors, neighborsTextRect)
-
-            row.append(rect)
-        cells.append(row)
-
-    # AI Move button
-    aiButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("AI Move", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = aiButton.center
-    pygame.draw.rect(screen, WHITE, aiButton)
-    screen.blit(buttonText, buttonRect)
-
-    # Reset button
-    resetButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("Reset", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = resetButton.center
-    pygame.draw.rect(screen, WHITE, resetButton)
-    screen.blit(buttonText, buttonRect)
+    for button, mouse in clicks:
+        cell = cell_at(mouse)
 
-    # Display text
-    text = "Lost" if lost else "Won" if game.mines == flags else ""
-    text = mediumFont.render(text, True, WHITE)
-    textRect = text.get_rect()
-    textRect.center = ((5 / 6) * width, (2 / 3) * height)
-    screen.blit(text, textRect)
+        # Check for a right-click to toggle flagging
+        if button == 3 and not lost:
+            if cell is not None and cell not in revealed:
+                flags ^= {cell}
+                dirty.add(cell)
 
-    move = None
+        elif button == 1:
 
-    left, _, right = pygame.mouse.get_pressed()
+            # If AI button clicked, ask the AI thread for a move
+            if aiButton.collidepoint(mouse) and not lost:
+                if not thinking:
+                    thinking = True
+                    requests.put((number, None))
 
-    # Check for a right-click to toggle flagging
-    if right == 1 and not lost:
-        mouse = pygame.mouse.get_pos()
-        for i in range(HEIGHT):
-            for j in range(WIDTH):
-                if cells[i][j].collidepoint(mouse) and (i, j) not in revealed:
-                    if (i, j) in flags:
-                        flags.remove((i, j))
-                    else:
-                        flags.add((i, j))
-                    time.sleep(0.2)
-
-    elif left == 1:
-        mouse = pygame.mouse.get_pos()
-
-        # If AI button clicked, make an AI move
-        if aiButton.collidepoint(mouse) and not lost:
-            move = ai.make_safe_move()
-            if move is None:
-                move = ai.make_random_move()
-                if move is None:
-                    flags = ai.mines.copy()
-                    print("No moves left to make.")
-                else:
-                    print("No known safe moves, AI making random move.")
-            else:
-                print("AI making safe move.")
-            time.sleep(0.2)
-
-        # Reset game state
-        elif resetButton.collidepoint(mouse):
-            game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
-            revealed = set()
-            flags = set()
-            lost = False
-            continue
+            # Reset game state
+            elif resetButton.collidepoint(mouse):
+                reset()
+                dirty.clear()
+                move = None
 
-        # User-made move
-        elif not lost:
-            for i in range(HEIGHT):
-                for j in range(WIDTH):
-                    if (cells[i][j].collidepoint(mouse)
-                            and (i, j) not in flags
-                            and (i, j) not in revealed):
-                        move = (i, j)
+            # User-made move
+            elif not lost and cell is not None:
+                if cell not in flags and cell not in revealed:
+                    move = cell
 
-    # Make move and update AI knowledge
+    # Make move, revealing the region around it if no mines are nearby,
+    # and update AI knowledge on the AI thread
     if move:
         if game.is_mine(move):
             lost = True
+            dirty |= game.mines
         else:
-            nearby = game.nearby_mines(move)
-            revealed.add(move)
-            ai.add_knowledge(move, nearby)
-
-    pygame.display.flip()
+            counts = {
+                cell: count for cell, count in game.reveal(move).items()
+                if cell not in revealed and cell not in flags
+            }
+            revealed |= counts.keys()
+            dirty |= counts.keys()
+            requests.put((number, counts))
+
+    # Draw the whole board after a reset, and only changed cells otherwise
+    if redraw:
+        screen.fill(BLACK)
+        for i in range(HEIGHT):
+            for j in range(WIDTH):
+                draw_cell((i, j))
+        dirty.clear()
+        draw_sidebar()
+        redraw = False
+        pygame.display.flip()
+    else:
+        rects = [draw_cell(cell) for cell in dirty]
+        dirty.clear()
+        rects.append(draw_sidebar())
+        pygame.display.update(rects)
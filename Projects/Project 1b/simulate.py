@@ -0,0 +1,104 @@
+import multiprocessing
+import random
+import sys
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+GAMES = 1000
+
+# Board height, width and number of mines for each kind of game
+BOARDS = [
+    (8, 8, 8),
+    (9, 9, 10),
+    (16, 16, 40),
+    (16, 30, 99)
+]
+
+
+def main():
+    if len(sys.argv) > 3 or not all(
+        arg.isdigit() and int(arg) > 0 for arg in sys.argv[1:]
+    ):
+        sys.exit("Usage: python simulate.py [games] [workers]")
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else GAMES
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    print(f"{games} games per board")
+    for height, width, mines in BOARDS:
+        start = time.perf_counter()
+        results = simulate(height, width, mines, games, workers)
+        elapsed = time.perf_counter() - start
+        print(f"  {height}x{width}, {mines} mines: "
+              f"won {results['win_rate']:.1%}, "
+              f"{results['moves']:.1f} moves per game, "
+              f"p50 {results['p50'] * 1e6:.0f} us, "
+              f"p90 {results['p90'] * 1e6:.0f} us, "
+              f"p99 {results['p99'] * 1e6:.0f} us per move "
+              f"({elapsed:.1f} s)")
+
+
+def play_game(task):
+    """
+    Play one game described by `task`, a tuple of height, width, number
+    of mines, seed and AI class. Return whether the game was won and the
+    time taken by each move, including choosing the move and adding what
+    it revealed to the AI's knowledge.
+    """
+    height, width, mines, seed, player = task
+    random.seed(seed)
+    game = Minesweeper(height, width, mines)
+    ai = player(height, width, mines=mines)
+    times = []
+    while len(ai.moves_made) < height * width - mines:
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        if move is None or game.is_mine(move):
+            return False, times
+        ai.add_knowledge(move, game.nearby_mines(move))
+        times.append(time.perf_counter() - start)
+    return True, times
+
+
+def simulate(height, width, mines, games, workers=None, seed=0,
+             player=MinesweeperAI):
+    """
+    Play `games` seeded games on a pool of `workers` processes, and return
+    a dictionary with the fraction of games won, the mean number of moves
+    per game and percentiles of the time taken per move.
+
+    Game i uses seed `seed + i`, so results don't depend on the number
+    of workers.
+    """
+    tasks = [
+        (height, width, mines, seed + i, player) for i in range(games)
+    ]
+    won = 0
+    times = []
+    with multiprocessing.Pool(workers) as pool:
+        for result, moves in pool.imap_unordered(
+            play_game, tasks, chunksize=max(1, games // 64)
+        ):
+            won += result
+            times.extend(moves)
+    times.sort()
+    return {
+        "win_rate": won / games,
+        "moves": len(times) / games,
+        "p50": percentile(times, 0.5),
+        "p90": percentile(times, 0.9),
+        "p99": percentile(times, 0.99)
+    }
+
+
+def percentile(ordered, fraction):
+    """Return the value below which `fraction` of sorted `ordered` fall."""
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+if __name__ == "__main__":
+    main()
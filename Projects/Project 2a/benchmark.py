@@ -0,0 +1,385 @@
+import math
+import multiprocessing
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from generate import (LINKS, corpus_from_links, generate_corpus,
+                      generate_power_law_corpus, power_law_links,
+                      write_corpus)
+from pagerank import (CHUNK_SIZE, DAMPING, GRAPH_FILE, LINK, SOLVERS,
+                      IncrementalPageRank, LinkGraph, LinkMatrix, crawl,
+                      crawl_links, extract_links, iterate_pagerank,
+                      load_graph, local_pagerank, pagerank_step,
+                      parallel_sample_pagerank, personalized_pagerank,
+                      sample_pagerank, solve_pagerank, top_ranks,
+                      write_graph)
+
+REPEATS = 3
+SAMPLES = 10 ** 7
+
+# Corpus sizes to measure scaling at, and the largest to write as HTML
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+CRAWL_LIMIT = 10 ** 5
+
+
+def main():
+    benchmarks = {
+        "iteration": benchmark_iteration,
+        "sampling": benchmark_sampling,
+        "parallel": benchmark_parallel,
+        "crawl": benchmark_crawl,
+        "extract": benchmark_extract,
+        "incremental": benchmark_incremental,
+        "solvers": benchmark_solvers,
+        "personalized": benchmark_personalized,
+        "graph": benchmark_graph,
+        "scaling": benchmark_scaling,
+        "top": benchmark_top
+    }
+    if len(sys.argv) > 2 or (
+        len(sys.argv) == 2 and sys.argv[1] not in benchmarks
+    ):
+        sys.exit(f"Usage: python benchmark.py [{'|'.join(benchmarks)}]")
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        benchmarks[name]()
+
+
+def dict_step(corpus, ranks, damping_factor):
+    """
+    One step of the original iterate_pagerank, which looks at every
+    pair of pages.
+    """
+    new_ranks = dict()
+    for page in corpus:
+        temp = 0
+        for linking_page in corpus:
+            if page in corpus[linking_page]:
+                temp += ranks[linking_page] / len(corpus[linking_page])
+            if len(corpus[linking_page]) == 0:
+                temp += ranks[linking_page] / len(corpus)
+        temp *= damping_factor
+        temp += (1 - damping_factor) / len(corpus)
+        new_ranks[page] = temp
+    return new_ranks
+
+
+def timed(function, repeats=REPEATS):
+    """Return the average wall time of `function` over `repeats` calls."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def benchmark_iteration():
+    """Time one step of power iteration, with dictionaries and the matrix."""
+    print(f"One PageRank step, {LINKS} links per page")
+    for pages in [1000, 3000, 100000, 1000000]:
+        corpus = generate_corpus(pages)
+        start = time.perf_counter()
+        matrix = LinkMatrix(corpus)
+        built = time.perf_counter() - start
+        ranks = [1 / pages] * pages
+        sparse = timed(lambda: pagerank_step(matrix, ranks, DAMPING))
+        line = (f"  {pages} pages: matrix built in {built * 1000:.0f} ms, "
+                f"step {sparse * 1000:.1f} ms")
+        if pages <= 3000:
+            old = {page: 1 / pages for page in corpus}
+            step = timed(lambda: dict_step(corpus, old, DAMPING))
+            line += f", dictionaries {step * 1000:.0f} ms"
+        print(line)
+
+
+def benchmark_sampling(samples=SAMPLES):
+    """Measure how fast sample_pagerank draws samples."""
+    print(f"Sampling PageRank, {samples} samples")
+    for name, corpus in [
+        ("corpus2", crawl("corpus2")),
+        ("100000 pages", generate_corpus(100000))
+    ]:
+        random.seed(0)
+        start = time.perf_counter()
+        sample_pagerank(corpus, DAMPING, samples)
+        elapsed = time.perf_counter() - start
+        print(f"  {name}: {samples / elapsed:,.0f} samples per second")
+
+
+def benchmark_parallel(samples=SAMPLES, pages=10000):
+    """
+    Time parallel_sample_pagerank across worker counts, and with early
+    stopping at a few tolerances.
+    """
+    corpus = generate_corpus(pages)
+    print(f"Parallel sampling, {pages} pages, up to {samples} samples")
+    print(f"  {multiprocessing.cpu_count()} CPUs available")
+    for workers in [1, 2, 4]:
+        start = time.perf_counter()
+        _, errors = parallel_sample_pagerank(
+            corpus, DAMPING, samples, workers, seed=0
+        )
+        print(f"  {workers} workers: "
+              f"{time.perf_counter() - start:.1f} s, "
+              f"widest interval +/-{max(errors.values()):.2e}")
+    for tolerance in [1e-4, 3e-5]:
+        start = time.perf_counter()
+        ranks, errors = parallel_sample_pagerank(
+            corpus, DAMPING, samples, batches=32, seed=0,
+            tolerance=tolerance
+        )
+        print(f"  stopping below +/-{tolerance:.0e}: "
+              f"{time.perf_counter() - start:.1f} s, "
+              f"widest interval +/-{max(errors.values()):.2e}")
+
+
+def whole_file_crawl(directory):
+    """The original crawl, which reads whole files and filters after."""
+    pages = dict()
+    for filename in os.listdir(directory):
+        if not filename.endswith(".html"):
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            contents = f.read()
+            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
+            pages[filename] = set(links) - {filename}
+    for filename in pages:
+        pages[filename] = set(
+            link for link in pages[filename]
+            if link in pages
+        )
+    return pages
+
+
+def benchmark_crawl(pages=20000):
+    """Measure pages crawled per second, whole files and streamed."""
+    print(f"Crawling {pages} pages")
+    print(f"  {multiprocessing.cpu_count()} CPUs available")
+    with tempfile.TemporaryDirectory() as directory:
+        write_corpus(directory, generate_corpus(pages))
+        start = time.perf_counter()
+        whole_file_crawl(directory)
+        elapsed = time.perf_counter() - start
+        print(f"  whole files: {pages / elapsed:,.0f} pages per second")
+        for workers in [1, 2, 4]:
+            start = time.perf_counter()
+            crawl_links(directory, workers)
+            elapsed = time.perf_counter() - start
+            print(f"  streamed, {workers} workers: "
+                  f"{pages / elapsed:,.0f} pages per second")
+
+
+def benchmark_extract(size=32 * 2 ** 20, links=1000):
+    """
+    Time finding the links in one large page and the memory it takes,
+    reading the whole file and streamed, for a page with tags
+    throughout and one whose links are followed by plain text.
+    """
+    print(f"Extracting links from a {size // 2 ** 20} MiB page")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "page.html")
+        anchors = "".join(
+            f'<p><a href="{i}.html">{i}</a></p>\n' for i in range(links)
+        )
+        paragraph = "<p>" + "rank " * 20 + "</p>\n"
+        for name, filler in [
+            ("tags throughout", paragraph * (size // len(paragraph))),
+            ("plain text after links", "rank " * (size // 5))
+        ]:
+            with open(path, "w") as f:
+                f.write(f"<html><body>{anchors}<p>{filler}</p></body></html>")
+            for method, function in [
+                ("whole file", lambda: set(LINK.findall(open(path).read()))),
+                ("streamed", lambda: extract_links((path, CHUNK_SIZE)))
+            ]:
+                tracemalloc.start()
+                start = time.perf_counter()
+                found = function()
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(f"  {name}, {method}: {elapsed:.2f} s, "
+                      f"{peak / 2 ** 20:.1f} MiB peak, {len(found)} links")
+
+
+def benchmark_incremental(pages=20000, edits=10, tolerance=1e-9):
+    """
+    Time ranking a corpus again after editing a few pages, from scratch
+    and incrementally from the saved state.
+    """
+    print(f"Ranking {pages} pages again after editing {edits}")
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = generate_corpus(pages)
+        write_corpus(directory, corpus)
+        state = os.path.join(directory, "state.json")
+        ranker = IncrementalPageRank(directory, state=state,
+                                     tolerance=tolerance)
+        ranker.update()
+        ranker.save()
+
+        # Edit some pages to link to one more page each
+        rng = random.Random(1)
+        names = list(corpus)
+        for page in rng.sample(names, edits):
+            with open(os.path.join(directory, page), "a") as f:
+                f.write(f'<a href="{rng.choice(names)}">more</a>')
+
+        for name, saved in [("from scratch", None), ("incrementally", state)]:
+            start = time.perf_counter()
+            ranker = IncrementalPageRank(directory, state=saved,
+                                         tolerance=tolerance)
+            ranker.update()
+            print(f"  {name}: {time.perf_counter() - start:.2f} s, "
+                  f"{ranker.steps} steps")
+
+
+def benchmark_solvers(pages=20000, tolerance=1e-8):
+    """
+    Compare steps and time to convergence of each solver on power-law
+    corpora, at the usual damping factor and one close to 1.
+    """
+    matrix = LinkMatrix(generate_power_law_corpus(pages))
+    print(f"Solving PageRank, {pages} power-law pages, "
+          f"tolerance {tolerance:.0e}")
+    for damping_factor in [DAMPING, 0.99]:
+        print(f"  damping factor {damping_factor}")
+        for solver in SOLVERS:
+            start = time.perf_counter()
+            _, steps = solve_pagerank(matrix, damping_factor, solver,
+                                      tolerance)
+            print(f"    {solver}: {steps} steps, "
+                  f"{time.perf_counter() - start:.1f} s")
+
+
+def benchmark_personalized(pages=20000, seeds=8, tolerance=1e-6):
+    """
+    Time personalized PageRank for several seeds, one at a time and
+    together, and for one seed by pushing rank out from it.
+    """
+    corpus = generate_power_law_corpus(pages)
+    names = random.Random(0).sample(list(corpus), seeds)
+    print(f"Personalized PageRank, {pages} power-law pages, "
+          f"{seeds} seeds")
+    start = time.perf_counter()
+    for name in names:
+        personalized_pagerank(corpus, DAMPING, [[name]], tolerance)
+    print(f"  one at a time: {time.perf_counter() - start:.1f} s")
+    start = time.perf_counter()
+    ranks = personalized_pagerank(corpus, DAMPING, [[name] for name in names],
+                                  tolerance)[0]
+    print(f"  together: {time.perf_counter() - start:.1f} s")
+    for epsilon in [1e-4, 1e-6]:
+        start = time.perf_counter()
+        local = local_pagerank(corpus, DAMPING, names[0], epsilon)
+        error = sum(abs(local.get(page, 0) - rank)
+                    for page, rank in ranks.items())
+        print(f"  pushed from one seed, epsilon {epsilon:.0e}: "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms, "
+              f"{len(local)} pages reached, total error {error:.3f}")
+
+
+def benchmark_graph():
+    """
+    Time opening a corpus's saved link graph against crawling it again,
+    and ranking from the graph against ranking from the crawled corpus.
+    """
+    print("Saved link graphs")
+    for pages in [20000, 100000]:
+        with tempfile.TemporaryDirectory() as directory:
+            write_corpus(directory, generate_corpus(pages), filler=200)
+            start = time.perf_counter()
+            corpus = crawl(directory)
+            crawled = time.perf_counter() - start
+            start = time.perf_counter()
+            load_graph(directory)
+            built = time.perf_counter() - start
+            start = time.perf_counter()
+            graph = load_graph(directory)
+            loaded = time.perf_counter() - start
+            start = time.perf_counter()
+            LinkGraph(os.path.join(directory, GRAPH_FILE))
+            mapped = time.perf_counter() - start
+            print(f"  {pages} pages: crawled in {crawled:.2f} s, "
+                  f"graph built in {built:.2f} s, "
+                  f"loaded in {loaded * 1000:.0f} ms "
+                  f"({mapped * 1000:.1f} ms without checking for changes)")
+            start = time.perf_counter()
+            iterate_pagerank(corpus, DAMPING)
+            from_corpus = time.perf_counter() - start
+            start = time.perf_counter()
+            iterate_pagerank(graph, DAMPING)
+            print(f"    ranked in {from_corpus:.2f} s from the corpus, "
+                  f"{time.perf_counter() - start:.2f} s from the graph")
+
+
+def benchmark_scaling(sizes=SIZES, crawl_limit=CRAWL_LIMIT,
+                      samples_per_page=20):
+    """
+    Time crawling, sampling and iterating on power-law corpora of
+    growing size, and measure how far apart the two estimates are.
+    Corpora above `crawl_limit` pages are not written as HTML, and are
+    ranked from a link graph written straight from their links.
+    """
+    print(f"Scaling, power-law corpora, {LINKS} links per page, "
+          f"{samples_per_page} samples per page")
+    for pages in sizes:
+        names, links = power_law_links(pages)
+        with tempfile.TemporaryDirectory() as directory:
+            line = f"  {pages} pages:"
+            if pages <= crawl_limit:
+                write_corpus(directory, corpus_from_links(names, links),
+                             filler=200)
+                start = time.perf_counter()
+                crawl(directory)
+                line += f" crawl {time.perf_counter() - start:.2f} s,"
+            path = os.path.join(directory, GRAPH_FILE)
+            write_graph(path, names, links)
+            graph = LinkGraph(path)
+            random.seed(0)
+            start = time.perf_counter()
+            sampled = sample_pagerank(graph, DAMPING,
+                                      samples_per_page * pages)
+            line += f" sample {time.perf_counter() - start:.2f} s,"
+            start = time.perf_counter()
+            iterated = iterate_pagerank(graph, DAMPING, tolerance=1e-6)
+            line += f" iterate {time.perf_counter() - start:.2f} s"
+            differences = [abs(sampled[page] - iterated[page])
+                           for page in iterated]
+
+            # Mean total difference if samples were drawn independently
+            noise = sum(
+                math.sqrt(2 * rank * (1 - rank)
+                          / (math.pi * samples_per_page * pages))
+                for rank in iterated.values()
+            )
+            del graph, sampled, iterated
+            print(line)
+            print(f"    estimates differ by {sum(differences):.3f} in "
+                  f"total ({noise:.3f} expected from sampling alone), "
+                  f"{max(differences):.1e} at most")
+
+
+def benchmark_top(pages=10 ** 6, k=100):
+    """
+    Time finding the `k` highest ranks by partial selection, against
+    sorting every page by rank.
+    """
+    rng = random.Random(0)
+    ranks = [rng.paretovariate(1.5) for _ in range(pages)]
+    total = sum(ranks)
+    ranks = [rank / total for rank in ranks]
+    print(f"Top {k} of {pages} ranks")
+    selection = timed(lambda: top_ranks(ranks, k))
+    ordering = timed(
+        lambda: sorted(range(pages), key=ranks.__getitem__, reverse=True)[:k]
+    )
+    print(f"  selection {selection * 1000:.0f} ms, "
+          f"sorting {ordering * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
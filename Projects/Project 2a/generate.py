@@ -0,0 +1,123 @@
+import os
+import random
+import sys
+
+from pagerank import write_graph
+
+LINKS = 10
+DANGLING = 0.05
+LOCAL = 0.8
+FILLER = 2000
+
+
+def main():
+    if len(sys.argv) not in [3, 4, 5] or not all(
+        arg.replace(".", "", 1).isdigit() for arg in sys.argv[2:]
+    ):
+        sys.exit("Usage: python generate.py (directory | file.graph) "
+                 "pages [links [dangling]]")
+    target = sys.argv[1]
+    pages = int(sys.argv[2])
+    links = int(sys.argv[3]) if len(sys.argv) > 3 else LINKS
+    dangling = float(sys.argv[4]) if len(sys.argv) > 4 else DANGLING
+
+    names, page_links = power_law_links(pages, links, dangling)
+    if target.endswith(".graph"):
+        write_graph(target, names, page_links)
+    else:
+        os.makedirs(target, exist_ok=True)
+        write_corpus(target, corpus_from_links(names, page_links))
+    print(f"Wrote {pages} pages with "
+          f"{sum(map(len, page_links))} links to {target}")
+
+
+def uniform_links(pages, links=LINKS, dangling=DANGLING, seed=0):
+    """
+    Return the names of `pages` random pages and their links, as
+    link_table does. Each page links to `links` others chosen alike,
+    except for a fraction `dangling` that link to none.
+    """
+    rng = random.Random(seed)
+    names = [f"{i}.html" for i in range(pages)]
+    page_links = []
+    for i in range(pages):
+        if rng.random() < dangling:
+            page_links.append(())
+            continue
+        targets = rng.sample(range(pages - 1), min(links, pages - 1))
+        page_links.append(tuple(sorted(t + (t >= i) for t in targets)))
+    return names, page_links
+
+
+def power_law_links(pages, links=LINKS, dangling=DANGLING, local=LOCAL,
+                    seed=0):
+    """
+    Return the names of `pages` random pages and their links, as
+    link_table does. Each page links to about `links` others, except
+    for a fraction `dangling` that link to none. A fraction `local` of
+    links go to nearby pages, as within a site; the rest go to pages
+    chosen in proportion to how many links they already have, so the
+    number of links to a page follows a power law.
+    """
+    rng = random.Random(seed)
+    names = [f"{i}.html" for i in range(pages)]
+    page_links = []
+
+    # Every page appears once, plus once for each link to it
+    targets = list(range(pages))
+    for i in range(pages):
+        found = set()
+        if rng.random() >= dangling:
+            for _ in range(links):
+                if rng.random() < local:
+                    t = (i + rng.randint(-links, links)) % pages
+                else:
+                    t = rng.choice(targets)
+                if t != i:
+                    found.add(t)
+                    targets.append(t)
+        page_links.append(tuple(sorted(found)))
+    return names, page_links
+
+
+def corpus_from_links(names, page_links):
+    """Return the corpus dictionary, as crawl does, for pages' links."""
+    return {
+        name: {names[t] for t in targets}
+        for name, targets in zip(names, page_links)
+    }
+
+
+def generate_corpus(pages, links=LINKS, dangling=DANGLING, seed=0):
+    """Return a random corpus with links made by uniform_links."""
+    return corpus_from_links(*uniform_links(pages, links, dangling, seed))
+
+
+def generate_power_law_corpus(pages, links=LINKS, dangling=DANGLING,
+                              local=LOCAL, seed=0):
+    """Return a random corpus with links made by power_law_links."""
+    return corpus_from_links(
+        *power_law_links(pages, links, dangling, local, seed)
+    )
+
+
+def write_corpus(directory, corpus, filler=FILLER, seed=0):
+    """
+    Write `corpus` to `directory` as HTML pages, each with about
+    `filler` characters of text around its links.
+    """
+    rng = random.Random(seed)
+    words = ["search", "graph", "page", "rank", "link", "<b>node</b>"]
+    for page, links in corpus.items():
+        parts = ["<html><body><p>"]
+        for link in links:
+            parts.append(" ".join(rng.choices(words, k=filler // 60)))
+            parts.append(f'<a class="link" href="{link}">{link}</a>')
+        parts.append(" ".join(rng.choices(words, k=filler // 6)))
+        parts.append("</p></body></html>")
+        with open(os.path.join(directory, page), "w") as f:
+            f.write("\n".join(parts))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,171 @@
+import array
+import collections
+import csv
+import hashlib
+import heapq
+import io
+import json
+import math
+import mmap
+import multiprocessing
+import operator
 import os
 import random
 import re
+import struct
 import sys
+from collections.abc import Sequence
 
 DAMPING = 0.85
+CHUNK_SIZE = 1 << 16
+TAG_SIZE = 1 << 12
 SAMPLES = 10000
 
+# Total change in ranks below which iteration stops, and steps between
+# extrapolations for the solvers that use them
+TOLERANCE = 0.001
+EXTRAPOLATE = 10
+
+# Fewest batches to trust a confidence interval from when stopping early
+MIN_BATCHES = 4
+
+# Links in an HTML page
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# File a corpus's link graph is kept in, within the corpus directory,
+# and the start of the file: a tag, a fingerprint of the pages it was
+# built from, and the numbers of pages, links, pages without links and
+# bytes of page names
+GRAPH_FILE = ".pagerank.graph"
+GRAPH_HEADER = struct.Struct("8s32sqqqq")
+GRAPH_MAGIC = b"PRGRAPH1"
+
+# File ranks are saved to every CHECKPOINT_STEPS steps while iterating,
+# so a long run can be resumed, and the start of the file: a tag, and
+# the numbers of pages and steps taken
+CHECKPOINT_FILE = ".pagerank.checkpoint"
+CHECKPOINT_HEADER = struct.Struct("8sqq")
+CHECKPOINT_MAGIC = b"PRCHECK1"
+CHECKPOINT_STEPS = 10
+
+# Machine-readable formats results can be written in
+FORMATS = ["csv", "jsonl"]
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    args = sys.argv[2:]
+    form = args.pop() if args and args[-1] in FORMATS else None
+    top = int(args.pop(0)) if args and args[0].isdigit() else None
+    if len(sys.argv) < 2 or args:
+        sys.exit("Usage: python pagerank.py corpus [top] [csv|jsonl]")
+    corpus = load_graph(sys.argv[1])
+    checkpoint = os.path.join(sys.argv[1], CHECKPOINT_FILE)
+
+    # Write ranks from iteration alone, a line at a time
+    if form is not None:
+        ranks, _ = solve_pagerank(corpus, DAMPING, checkpoint=checkpoint)
+        order = top_ranks(ranks, top) if top is not None else None
+        write_ranks(sys.stdout, corpus.pages, ranks, form, order)
+        return
+
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    if top is not None:
+        for page in heapq.nlargest(top, ranks, key=ranks.get):
+            print(f"  {page}: {ranks[page]:.4f}")
+    else:
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+    ranks, _ = solve_pagerank(corpus, DAMPING, checkpoint=checkpoint)
     print(f"PageRank Results from Iteration")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
+    if top is not None:
+        for i in top_ranks(ranks, top):
+            print(f"  {corpus.pages[i]}: {ranks[i]:.4f}")
+    else:
+        ranks = dict(zip(corpus.pages, ranks))
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, workers=1):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
     """
-    pages = dict()
+    pages, links = crawl_links(directory, workers)
+    return {
+        page: {pages[link] for link in targets}
+        for page, targets in zip(pages, links)
+    }
+
+
+def crawl_links(directory, workers=1, chunk_size=CHUNK_SIZE):
+    """
+    Parse a directory of HTML pages like crawl, reading each file in
+    chunks of `chunk_size` characters, on a pool of `workers` processes
+    if there is more than one.
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    Return a list of the pages, numbered by their position in it, and
+    a list holding, for each page, a tuple of the numbers of the other
+    pages it links to, as link_table does.
+    """
+    pages = [
+        entry.name for entry in os.scandir(directory)
+        if entry.name.endswith(".html")
+    ]
+    index = {page: i for i, page in enumerate(pages)}
+    tasks = [(os.path.join(directory, page), chunk_size) for page in pages]
 
     # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
+    links = []
+
+    def add(found):
+        i = len(links)
+        links.append(tuple(sorted(
+            index[link] for link in found
+            if link in index and index[link] != i
+        )))
+
+    if workers == 1:
+        for task in tasks:
+            add(extract_links(task))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for found in pool.imap(
+                extract_links, tasks,
+                chunksize=max(1, len(tasks) // (16 * (workers or 1)))
+            ):
+                add(found)
+    return pages, links
 
-    return pages
+
+def extract_links(task):
+    """
+    Return the set of links in the HTML file at `path`, reading it
+    `chunk_size` characters at a time. A tag cut off by the end of a
+    chunk is carried over to the next, unless it is longer than
+    TAG_SIZE characters.
+    """
+    path, chunk_size = task
+    links = set()
+    rest = ""
+    with open(path) as f:
+        while chunk := f.read(chunk_size):
+            text = rest + chunk
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+
+            # Keep any tag cut off by the end of the chunk for the next one
+            start = text.rfind("<", end)
+            if (start != -1 and len(text) - start <= TAG_SIZE
+                    and text.find(">", start) == -1):
+                rest = text[start:]
+            else:
+                rest = ""
+    return links
 
 
 def transition_model(corpus, page, damping_factor):
@@ -57,28 +177,18 @@ def transition_model(corpus, page, damping_factor):
     linked to by `page`. With probability `1 - damping_factor`, choose
     a link at random chosen from all pages in the corpus.
     """
-    # Initializing a dictionary for storing probabilities and a list for storing pages with no outgoing links
-    probabilities = {}
+    # Every page can be reached by choosing from all pages at random
+    probabilities = {i: (1 - damping_factor) / len(corpus) for i in corpus}
     links = corpus[page]
-    available_links = []
+
     # If page has no outgoing links, return a probability distribution that chooses randomly among all pages with equal probability
-    for i in corpus:
-        if not corpus[i]:
-            available_links.append(i)
-            probabilities[i] = 0
+    if not links:
+        return {i: 1 / len(corpus) for i in corpus}
+
     # Calculate probabilities for links with damping factor
     for link in links:
-        probabilities[link] = damping_factor * (1 / len(links))
-    
-    # Calculate probabilities for pages with no outgoing links
-    for link in available_links:
-        probabilities[link] = (1 - damping_factor) / len(corpus)
-    
-    # Normalize probabilities so they sum to 1
-    total_probability = sum(probabilities.values())
-    for key in probabilities:
-        probabilities[key] /= total_probability
-    
+        probabilities[link] += damping_factor / len(links)
+
     return probabilities
 
 
@@ -90,23 +200,143 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    `corpus` can also be a LinkGraph.
     """
-    # Initializing a list with the keys of the corpus dictionary, a dictorionary for storing created pages and a random page
-    pages = list(corpus.keys())
-    created_pages = {}
-    page = random.choice(pages)
-    # Assigning initial rank values to created pages
-    for i in pages:
-        created_pages[i] = 0
-    created_pages[page] = 1 / n
-    # Creating n-1 pages
-    for i in range(n-1):
-        new_page = transition_model(corpus, page, damping_factor)
-        page = random.choices(list(new_page.keys()), weights=list(new_page.values()))[0]
-        created_pages[page] += 1 / n
-    return created_pages
-
-def iterate_pagerank(corpus, damping_factor):
+    if isinstance(corpus, LinkGraph):
+        pages, links = corpus.pages, corpus.links
+    else:
+        pages, links = link_table(corpus)
+    visits = walk(links, damping_factor, n, random)
+    return {page: count / n for page, count in zip(pages, visits)}
+
+
+def walk(links, damping_factor, n, rng):
+    """
+    Return how many times each page is visited by a random surfer taking
+    `n` steps from a random page, following `links` from link_table and
+    drawing from `rng`.
+    """
+    visits = [0] * len(links)
+
+    # The transition model mixes following a link with jumping to any
+    # page, so each step takes one choice from one of the two
+    page = rng.randrange(len(links))
+    visits[page] += 1
+    for _ in range(n - 1):
+        targets = links[page]
+        if targets and rng.random() < damping_factor:
+            page = targets[int(rng.random() * len(targets))]
+        else:
+            page = rng.randrange(len(links))
+        visits[page] += 1
+    return visits
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, workers=None,
+                             batches=None, seed=None, tolerance=None):
+    """
+    Estimate PageRank like sample_pagerank, splitting the `n` samples
+    into `batches` independent walks run on a pool of `workers`
+    processes, each with its own seeded random number generator.
+
+    Return a dictionary of PageRank values, and a dictionary of the
+    half-width of a 95% confidence interval for each value, estimated
+    from how much the batches disagree. If `tolerance` is given, stop
+    early once at least MIN_BATCHES batches are done and every
+    half-width is below it.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if batches is None:
+        batches = max(4 * workers, 8)
+
+    # Every batch takes at least one sample
+    batches = min(batches, n)
+    pages, links = link_table(corpus)
+    rng = random.Random(seed)
+    walks = [
+        (damping_factor, n // batches + (i < n % batches), rng.getrandbits(64))
+        for i in range(batches)
+    ]
+
+    # Sums over batches of each page's share of visits, and its square
+    totals = [0] * len(pages)
+    squares = [0] * len(pages)
+    samples = done = 0
+
+    # Batches are merged in order, so a seed gives the same result
+    # whatever the timing; leaving the pool stops any still running
+    with multiprocessing.Pool(
+        workers, initializer=share_links, initargs=(links,)
+    ) as pool:
+        for steps, visits in pool.imap(walk_batch, walks):
+            samples += steps
+            done += 1
+            for i, count in enumerate(visits):
+                totals[i] += count
+                squares[i] += (count / steps) ** 2
+            if tolerance is not None and done >= MIN_BATCHES:
+                if max(confidence(totals, squares, samples, done)) < tolerance:
+                    break
+    errors = confidence(totals, squares, samples, done)
+    return (
+        {page: count / samples for page, count in zip(pages, totals)},
+        dict(zip(pages, errors))
+    )
+
+
+def confidence(totals, squares, samples, batches):
+    """
+    Return the half-width of a 95% confidence interval for each page's
+    share of `samples` visits, from the spread of the shares found by
+    `batches` equal batches.
+    """
+    if batches < 2:
+        return [math.inf] * len(totals)
+    errors = []
+    for total, square in zip(totals, squares):
+        mean = total / samples
+        variance = max(square / batches - mean ** 2, 0)
+        variance *= batches / (batches - 1)
+        errors.append(1.96 * math.sqrt(variance / batches))
+    return errors
+
+
+# Links of the corpus in each worker process of parallel_sample_pagerank
+shared_links = None
+
+
+def share_links(links):
+    """Keep the link table in a worker, so it is only sent once."""
+    global shared_links
+    shared_links = links
+
+
+def walk_batch(batch):
+    """Run one batch of parallel_sample_pagerank in a worker."""
+    damping_factor, steps, seed = batch
+    return steps, walk(shared_links, damping_factor, steps,
+                       random.Random(seed))
+
+
+def link_table(corpus):
+    """
+    Return a list of the pages in `corpus`, and a list holding, for each
+    page, a tuple of the positions in the first list of the pages it
+    links to.
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    links = [
+        tuple(index[link] for link in corpus[page] if link in index)
+        for page in pages
+    ]
+    return pages, links
+
+
+def iterate_pagerank(corpus, damping_factor, solver="power",
+                     tolerance=TOLERANCE, checkpoint=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -114,37 +344,681 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    `solver`, `tolerance` and `checkpoint` are as for solve_pagerank.
+    `corpus` can also be a LinkGraph.
+    """
+    matrix = corpus if isinstance(corpus, LinkGraph) else LinkMatrix(corpus)
+    ranks, _ = solve_pagerank(matrix, damping_factor, solver, tolerance,
+                              checkpoint=checkpoint)
+    return dict(zip(matrix.pages, ranks))
+
+
+class LinkMatrix():
+    """
+    Links of a corpus as a sparse matrix in compressed sparse row form.
+    Row i lists the pages linking to page i: their indices are
+    sources[pointers[i]:pointers[i + 1]]. Pages without links are kept
+    apart, since they link to every page alike.
+    """
+
+    def __init__(self, corpus):
+        self.load(*link_table(corpus))
+
+    @classmethod
+    def from_links(cls, pages, links):
+        """
+        Return the matrix for `pages` and their `links`, given as by
+        link_table or crawl_links.
+        """
+        matrix = cls.__new__(cls)
+        matrix.load(pages, links)
+        return matrix
+
+    def load(self, pages, links):
+        """Build the matrix from `pages` and their `links`."""
+        self.pages = pages
+
+        # Share of a page's rank passed along each of its links
+        self.shares = array.array("d", (
+            1 / len(targets) if targets else 0 for targets in links
+        ))
+        self.dangling = array.array("l", (
+            i for i, targets in enumerate(links) if not targets
+        ))
+        self.is_dangling = bytearray(not targets for targets in links)
+
+        # Group links by the page they point to
+        incoming = [[] for _ in pages]
+        for i, targets in enumerate(links):
+            for target in targets:
+                incoming[target].append(i)
+        self.pointers = array.array("l", [0])
+        self.sources = array.array("l")
+        for sources in incoming:
+            self.sources.extend(sources)
+            self.pointers.append(len(self.sources))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def multiply(self, ranks):
+        """
+        Return the rank each page receives through links when every
+        page splits `ranks` evenly among its links, not counting pages
+        without links.
+        """
+        passed = list(map(operator.mul, ranks, self.shares))
+        sources = self.sources
+        pointers = self.pointers
+        return [
+            sum(map(passed.__getitem__, sources[pointers[i]:pointers[i + 1]]))
+            for i in range(len(self.pages))
+        ]
+
+    def multiply_block(self, block):
+        """
+        Return multiply for each list of ranks in `block`, reading the
+        links into each page once for all of them.
+        """
+        passed = [list(map(operator.mul, ranks, self.shares))
+                  for ranks in block]
+        received = [[] for _ in block]
+        sources = self.sources
+        pointers = self.pointers
+        for i in range(len(self.pages)):
+            incoming = sources[pointers[i]:pointers[i + 1]]
+            for column, ranks in zip(received, passed):
+                column.append(sum(map(ranks.__getitem__, incoming)))
+        return received
+
+
+class LinkGraph(LinkMatrix):
+    """
+    A LinkMatrix kept in a file by write_graph, read through a memory
+    map, so opening it reads nothing until the links are used. Page names
+    and each page's links are also kept, as `pages` and `links`, which
+    can be used like the lists returned by link_table.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.read(buffer, path)
+
+    @classmethod
+    def from_links(cls, pages, links, stamp=bytes(32)):
+        """
+        Return the graph of `pages` and their `links`, given as by
+        link_table, kept in memory instead of in a file.
+        """
+        f = io.BytesIO()
+        dump_graph(f, pages, links, stamp)
+        graph = cls.__new__(cls)
+        graph.read(f.getvalue(), "graph")
+        return graph
+
+    def read(self, buffer, name):
+        """Use the graph in `buffer`, laid out as dump_graph writes it."""
+        self.buffer = buffer
+        view = memoryview(buffer)
+        magic, self.fingerprint, n, links, dangling, names = (
+            GRAPH_HEADER.unpack_from(view)
+        )
+        if magic != GRAPH_MAGIC:
+            raise ValueError(f"{name} is not a link graph")
+        offset = GRAPH_HEADER.size
+
+        def section(format, count):
+            nonlocal offset
+            size = count * struct.calcsize(format)
+            part = view[offset:offset + size].cast(format)
+            offset += -size % 8 + size
+            return part
+
+        self.pages = PageNames(section("q", n + 1), section("B", names))
+        self.links = PageLinks(section("q", n + 1), section("q", links))
+        self.pointers = section("q", n + 1)
+        self.sources = section("q", links)
+        self.shares = section("d", n)
+        self.dangling = section("q", dangling)
+        self.is_dangling = section("B", n)
+
+
+class PageNames(Sequence):
+    """Names of the pages of a LinkGraph, decoded as they are read."""
+
+    def __init__(self, offsets, names):
+        self.offsets = offsets
+        self.names = names
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self))[i]]
+        i = range(len(self))[i]
+        return str(self.names[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class PageLinks(Sequence):
+    """Numbers of the pages each page of a LinkGraph links to."""
+
+    def __init__(self, pointers, targets):
+        self.pointers = pointers
+        self.targets = targets
+
+    def __len__(self):
+        return len(self.pointers) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self))[i]]
+        i = range(len(self))[i]
+        return self.targets[self.pointers[i]:self.pointers[i + 1]]
+
+
+def load_graph(directory, path=None, workers=1):
+    """
+    Return the LinkGraph of the HTML pages in `directory`, kept in the
+    file at `path`, GRAPH_FILE in the directory by default. The file is
+    written again, crawling on `workers` processes, if it is missing or
+    the pages have changed since it was written. If it can't be written,
+    the graph is kept in memory instead.
+    """
+    if path is None:
+        path = os.path.join(directory, GRAPH_FILE)
+    stamp = fingerprint(directory)
+
+    # Check the header alone, so a stale graph is never mapped while its
+    # file is being replaced
+    try:
+        with open(path, "rb") as f:
+            magic, saved = GRAPH_HEADER.unpack(
+                f.read(GRAPH_HEADER.size)
+            )[:2]
+        if magic == GRAPH_MAGIC and saved == stamp:
+            return LinkGraph(path)
+    except (OSError, struct.error):
+        pass
+    pages, links = crawl_links(directory, workers)
+    try:
+        write_graph(path, pages, links, stamp)
+    except OSError:
+        # Keep the graph in memory if it can't be saved
+        return LinkGraph.from_links(pages, links, stamp)
+    return LinkGraph(path)
+
+
+def fingerprint(directory):
+    """
+    Return a digest of the name, modification time and size of each
+    HTML page in `directory`, which changes whenever any page does.
+    """
+    digest = hashlib.sha256()
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        if entry.name.endswith(".html"):
+            stat = entry.stat()
+            digest.update(
+                f"{entry.name}\0{stat.st_mtime_ns}\0{stat.st_size}\0".encode()
+            )
+    return digest.digest()
+
+
+def write_graph(path, pages, links, stamp=bytes(32)):
+    """
+    Write `pages` and their `links`, given as by link_table, to the
+    file at `path` for LinkGraph to read, with `stamp` as its
+    fingerprint. The file is replaced in one step, so a graph being
+    read is never seen half written.
     """
-    # Initializing pages number with the number of pages in the corpus, and two dictionaries for storing old and new rank values
-    pages_number = len(corpus)
-    old_dict = {}
-    new_dict = {}
-    # Iterating through all pages in the corpus and assigning them initial rank values
-    for page in corpus:
-        old_dict[page] = 1 / pages_number
-    # Calculating new rank values until the difference between old and new values is less than 0.001
+    with open(path + ".tmp", "wb") as f:
+        dump_graph(f, pages, links, stamp)
+    os.replace(path + ".tmp", path)
+
+
+def dump_graph(f, pages, links, stamp):
+    """Write the graph of `pages` and their `links` to the file `f`."""
+    matrix = LinkMatrix.from_links(pages, links)
+    names = [page.encode() for page in pages]
+    offsets = array.array("q", [0])
+    pointers = array.array("q", [0])
+    targets = array.array("q")
+    for name, page_links in zip(names, links):
+        offsets.append(offsets[-1] + len(name))
+        targets.extend(page_links)
+        pointers.append(len(targets))
+    sections = [
+        offsets, b"".join(names), pointers, targets,
+        array.array("q", matrix.pointers), array.array("q", matrix.sources),
+        matrix.shares, array.array("q", matrix.dangling), matrix.is_dangling
+    ]
+    f.write(GRAPH_HEADER.pack(
+        GRAPH_MAGIC, stamp, len(pages), len(targets),
+        len(matrix.dangling), offsets[-1]
+    ))
+    for section in sections:
+        f.write(section)
+        f.write(bytes(-len(memoryview(section).cast("B")) % 8))
+
+
+def solve_pagerank(matrix, damping_factor, solver="power",
+                   tolerance=TOLERANCE, ranks=None, checkpoint=None):
+    """
+    Return the PageRank of each page of `matrix`, as a list in the order
+    of matrix.pages, and the number of steps taken. Steps are repeated
+    until they change the ranks by less than `tolerance` in total,
+    starting from `ranks` if given, and from equal ranks otherwise.
+
+    If `checkpoint` is given, the ranks are saved to that file every
+    CHECKPOINT_STEPS steps, and iteration resumes from the file if it
+    holds ranks for as many pages. The file is removed once the ranks
+    converge, and no longer written if it can't be. Ranks saved for another corpus only change where
+    iteration starts, not the result.
+
+    The solver is one of:
+        "power": update every page from the ranks of the last step
+        "gauss-seidel": update pages in turn, using the ranks already
+            updated in the same step
+        "aitken": power steps, with Aitken extrapolation from the last
+            three steps every EXTRAPOLATE steps
+        "quadratic": power steps, with quadratic extrapolation from
+            the last four steps every EXTRAPOLATE steps
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"unknown solver {solver!r}")
+    step, extrapolate, needed = SOLVERS[solver]
+    n = len(matrix)
+    if ranks is None:
+        ranks = [1 / n] * n
+    steps = 0
+    if checkpoint is not None:
+        saved = read_checkpoint(checkpoint, n)
+        if saved is not None:
+            ranks, steps = saved
+    history = [ranks]
     while True:
-        for page in corpus:
-            temp = 0
-            for linking_page in corpus:
-                # Checking if page has links to other pages
-                if page in corpus[linking_page]:
-                    temp += (old_dict[linking_page] / len(corpus[linking_page]))
-                # Checking if page has no links to other pages
-                if len(corpus[linking_page]) == 0:
-                    temp += (old_dict[linking_page]) / len(corpus)
-            temp *= damping_factor
-            temp += (1 - damping_factor) / pages_number
-            new_dict[page] = temp
-        difference = max([abs(new_dict[x] - old_dict[x]) for x in old_dict])
-        # If the difference is less than 0.001, break the loop, this means that the rank values have converged
-        if difference < 0.001:
-            break
-        else:
-        # If the difference is more than 0.001, assign new rank values to old rank values and repeat the loop
-            old_dict = new_dict.copy()
+        new_ranks = step(matrix, ranks, damping_factor)
+        steps += 1
+        residual = sum(map(abs, map(operator.sub, new_ranks, ranks)))
+        ranks = new_ranks
+        if residual < tolerance:
+            if checkpoint is not None and os.path.exists(checkpoint):
+                try:
+                    os.remove(checkpoint)
+                except OSError:
+                    pass
+            return ranks, steps
+
+        # Jump ahead from the last few steps now and then
+        if extrapolate is not None:
+            history = history[-(needed - 1):] + [ranks]
+            if steps % EXTRAPOLATE == 0 and len(history) == needed:
+                ranks = normalize(extrapolate(*history))
+                history = [ranks]
+
+        if checkpoint is not None and steps % CHECKPOINT_STEPS == 0:
+            try:
+                write_checkpoint(checkpoint, ranks, steps)
+            except OSError:
+                checkpoint = None
+
+
+def read_checkpoint(path, n):
+    """
+    Return the ranks and number of steps saved in the checkpoint file
+    at `path`, or None if there is none with ranks for `n` pages.
+    """
+    try:
+        with open(path, "rb") as f:
+            magic, pages, steps = CHECKPOINT_HEADER.unpack(
+                f.read(CHECKPOINT_HEADER.size)
+            )
+            if magic != CHECKPOINT_MAGIC or pages != n:
+                return None
+            ranks = array.array("d")
+            ranks.fromfile(f, n)
+    except (OSError, EOFError, struct.error):
+        return None
+    return ranks.tolist(), steps
+
+
+def write_checkpoint(path, ranks, steps):
+    """
+    Save `ranks` and the number of `steps` taken to the checkpoint file
+    at `path`, replacing it in one step.
+    """
+    with open(path + ".tmp", "wb") as f:
+        f.write(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, len(ranks), steps))
+        array.array("d", ranks).tofile(f)
+    os.replace(path + ".tmp", path)
+
+
+def top_ranks(ranks, k):
+    """
+    Return the numbers of the `k` pages with the highest `ranks`, from
+    highest to lowest, without sorting the rest.
+    """
+    return heapq.nlargest(k, range(len(ranks)), key=ranks.__getitem__)
+
+
+def write_ranks(file, pages, ranks, form="csv", order=None):
+    """
+    Write each page and its rank to `file` as they are read, in CSV with
+    a header row or as JSON lines. Pages are written in the order of
+    their numbers in `order`, or all in turn if it is None.
+    """
+    if form not in FORMATS:
+        raise ValueError(f"unknown format {form!r}")
+    if order is None:
+        order = range(len(ranks))
+    if form == "csv":
+        writer = csv.writer(file)
+        writer.writerow(["page", "rank"])
+        for i in order:
+            writer.writerow([pages[i], ranks[i]])
+    else:
+        for i in order:
+            file.write(json.dumps({"page": pages[i], "rank": ranks[i]}) + "\n")
+
+
+def pagerank_step(matrix, ranks, damping_factor):
+    """
+    Return the ranks after one step of the random surfer from `ranks`.
+    """
+    n = len(matrix)
+
+    # Rank of pages without links is spread over all pages
+    spread = sum(ranks[i] for i in matrix.dangling) / n
+    base = (1 - damping_factor) / n + damping_factor * spread
+    return [
+        base + damping_factor * received
+        for received in matrix.multiply(ranks)
+    ]
+
+
+def gauss_seidel_step(matrix, ranks, damping_factor):
+    """
+    Return the ranks after updating each page in turn from `ranks`,
+    using the new rank of every page already updated.
+    """
+    n = len(matrix)
+    ranks = list(ranks)
+    shares = matrix.shares
+    passed = list(map(operator.mul, ranks, shares))
+    sources = matrix.sources
+    pointers = matrix.pointers
+    is_dangling = matrix.is_dangling
+    teleport = (1 - damping_factor) / n
+
+    # Rank of pages without links, kept up to date as they change
+    spread = sum(ranks[i] for i in matrix.dangling)
+    for i in range(n):
+        received = sum(map(passed.__getitem__,
+                           sources[pointers[i]:pointers[i + 1]]))
+        new_rank = teleport + damping_factor * (spread / n + received)
+        if is_dangling[i]:
+            spread += new_rank - ranks[i]
+        ranks[i] = new_rank
+        passed[i] = new_rank * shares[i]
+    return normalize(ranks)
+
+
+def aitken(first, second, third):
+    """
+    Return the limit of the ranks estimated by Aitken's delta-squared
+    method from three successive steps, taking each step to shrink the
+    last by the same ratio.
+    """
+    d1 = list(map(operator.sub, second, first))
+    d2 = list(map(operator.sub, third, second))
+    length = sum(map(operator.mul, d1, d1))
+    ratio = sum(map(operator.mul, d1, d2)) / length if length else 0
+    if not 0 < ratio < 1:
+        return third
+    scale = ratio / (1 - ratio)
+    return [max(x + scale * d, 0) for x, d in zip(third, d2)]
+
+
+def quadratic(first, second, third, fourth):
+    """
+    Return the ranks estimated by quadratic extrapolation from four
+    successive steps, removing the two largest error components left.
+    """
+    y1 = list(map(operator.sub, second, first))
+    y2 = list(map(operator.sub, third, first))
+    y3 = list(map(operator.sub, fourth, first))
+
+    def dot(a, b):
+        return sum(map(operator.mul, a, b))
+
+    # Least-squares fit of y3 by y1 and y2
+    a11, a12, a22 = dot(y1, y1), dot(y1, y2), dot(y2, y2)
+    b1, b2 = -dot(y1, y3), -dot(y2, y3)
+    determinant = a11 * a22 - a12 * a12
+    if not determinant:
+        return fourth
+    g1 = (b1 * a22 - b2 * a12) / determinant
+    g2 = (a11 * b2 - a12 * b1) / determinant
+    beta0, beta1, beta2 = g1 + g2 + 1, g2 + 1, 1
+    return [
+        max(beta0 * x1 + beta1 * x2 + beta2 * x3, 0)
+        for x1, x2, x3 in zip(second, third, fourth)
+    ]
+
+
+def normalize(ranks):
+    """Return `ranks` scaled to sum to 1."""
+    total = sum(ranks)
+    return [rank / total for rank in ranks]
+
+
+# Step, extrapolation and number of steps it needs for each solver
+SOLVERS = {
+    "power": (pagerank_step, None, 0),
+    "gauss-seidel": (gauss_seidel_step, None, 0),
+    "aitken": (pagerank_step, aitken, 3),
+    "quadratic": (pagerank_step, quadratic, 4)
+}
+
+
+def personalized_pagerank(corpus, damping_factor, seeds,
+                          tolerance=TOLERANCE):
+    """
+    Return the PageRank of each page of `corpus` for each of `seeds`, as
+    a list with a dictionary of ranks per seed. The random surfer jumps
+    to the pages of a seed, instead of to any page, when it stops
+    following links or reaches a page without links. A seed is a
+    collection of pages to jump to alike, or a dictionary from pages to
+    how often to jump to each.
+
+    All seeds are solved together, so each step reads the links once.
+    """
+    matrix = LinkMatrix(corpus)
+    index = {page: i for i, page in enumerate(matrix.pages)}
+    teleports = []
+    for seed in seeds:
+        weights = seed if isinstance(seed, dict) else dict.fromkeys(seed, 1)
+        if not weights:
+            raise ValueError("seed has no pages")
+        for page in weights:
+            if page not in index:
+                raise ValueError(f"seed page {page!r} not in corpus")
+        total = sum(weights.values())
+        teleport = [0] * len(matrix)
+        for page, weight in weights.items():
+            teleport[index[page]] = weight / total
+        teleports.append(teleport)
+    block = solve_personalized(matrix, damping_factor, teleports, tolerance)
+    return [dict(zip(matrix.pages, ranks)) for ranks in block]
+
+
+def solve_personalized(matrix, damping_factor, teleports,
+                       tolerance=TOLERANCE):
+    """
+    Return a list of ranks in the order of matrix.pages for each list of
+    jump probabilities in `teleports`, repeating steps until no ranks
+    change by more than `tolerance` in total.
+    """
+    block = [list(teleport) for teleport in teleports]
+    while True:
+        new_block = personalized_step(matrix, block, teleports,
+                                      damping_factor)
+        residual = max((
+            sum(map(abs, map(operator.sub, new_ranks, ranks)))
+            for new_ranks, ranks in zip(new_block, block)
+        ), default=0)
+        block = new_block
+        if residual < tolerance:
+            return block
+
+
+def personalized_step(matrix, block, teleports, damping_factor):
+    """
+    Return the ranks after one step from each list of ranks in `block`,
+    jumping by the matching list in `teleports`.
+    """
+    new_block = []
+    for ranks, received, teleport in zip(
+        block, matrix.multiply_block(block), teleports
+    ):
+        stranded = sum(ranks[i] for i in matrix.dangling)
+        jump = 1 - damping_factor + damping_factor * stranded
+        new_block.append([
+            damping_factor * r + jump * t
+            for r, t in zip(received, teleport)
+        ])
+    return new_block
+
+
+def local_pagerank(corpus, damping_factor, seed, epsilon=1e-6):
+    """
+    Return an estimate of the personalized PageRank of pages near
+    `seed`, as a dictionary of the pages reached, by pushing rank out
+    from the seed along links. Only pages close enough to the seed to
+    receive a share of rank above `epsilon` per link are looked at, so
+    the rest of the corpus is never read. The rank left unpushed is
+    below `epsilon` times the number of links at every page, and the
+    estimates fall short of the true ranks by that much in total.
+    """
+    if seed not in corpus:
+        raise ValueError(f"seed page {seed!r} not in corpus")
+    ranks = collections.defaultdict(float)
+    residues = collections.defaultdict(float, {seed: 1})
+    queue = collections.deque([seed])
+    while queue:
+        page = queue.popleft()
+        residue = residues.pop(page)
+        ranks[page] += (1 - damping_factor) * residue
+
+        # Rank at pages without links goes back to the seed
+        links = corpus[page] or (seed,)
+        share = damping_factor * residue / len(links)
+        for link in links:
+            before = residues[link]
+            residues[link] += share
+            threshold = epsilon * max(len(corpus[link]), 1)
+            if before < threshold <= residues[link]:
+                queue.append(link)
+    return dict(ranks)
+
+
+class IncrementalPageRank():
+    """
+    PageRank of a directory of HTML pages, kept up to date as pages are
+    added, edited or removed. Only files whose modification time or size
+    changed are parsed again, and iteration starts from the last ranks,
+    so small edits take few steps. The state can be saved to a file and
+    loaded again later.
+    """
+
+    def __init__(self, directory, damping_factor=DAMPING, state=None,
+                 solver="power", tolerance=TOLERANCE):
+        self.directory = directory
+        self.damping_factor = damping_factor
+        self.solver = solver
+        self.tolerance = tolerance
+        self.state = state
+
+        # Modification time and size, links found, and rank of each page
+        self.stamps = dict()
+        self.links = dict()
+        self.ranks = dict()
+
+        # Steps taken by the last update
+        self.steps = 0
+
+        if state is not None and os.path.exists(state):
+            with open(state) as f:
+                saved = json.load(f)
+            for page, (stamp, links, rank) in saved.items():
+                self.stamps[page] = tuple(stamp)
+                self.links[page] = set(links)
+                self.ranks[page] = rank
+
+    def update(self):
+        """
+        Parse the pages that changed since the last update, and return
+        the PageRank of every page, as iterate_pagerank does.
+        """
+        # Find pages that are new or changed, and forget removed ones
+        stamps = dict()
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".html"):
+                stat = entry.stat()
+                stamps[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        changed = [
+            page for page, stamp in stamps.items()
+            if self.stamps.get(page) != stamp
+        ]
+        for page in set(self.stamps) - set(stamps):
+            del self.links[page]
+            self.ranks.pop(page, None)
+        for page in changed:
+            self.links[page] = extract_links(
+                (os.path.join(self.directory, page), CHUNK_SIZE)
+            )
+        self.stamps = stamps
+
+        # Links may point to pages added since, so filter them each time
+        pages = list(self.stamps)
+        index = {page: i for i, page in enumerate(pages)}
+        matrix = LinkMatrix.from_links(pages, [
+            tuple(sorted(
+                index[link] for link in self.links[page]
+                if link in index and link != page
+            ))
+            for page in pages
+        ])
+
+        # Start from the last ranks, giving new pages an equal share
+        n = len(pages)
+        ranks = [self.ranks.get(page, 1 / n) for page in pages]
+        total = sum(ranks)
+        ranks = [rank / total for rank in ranks]
+        ranks, self.steps = solve_pagerank(
+            matrix, self.damping_factor, self.solver, self.tolerance, ranks
+        )
+        self.ranks = dict(zip(pages, ranks))
+        return dict(self.ranks)
+
+    def save(self, path=None):
+        """
+        Write the pages' times, links and ranks to the file at `path`,
+        or to the state file if no path is given.
+        """
+        if path is None:
+            path = self.state
+        if path is None:
+            raise ValueError("no state file to save to")
+        with open(path, "w") as f:
+            json.dump({
+                page: [self.stamps[page], sorted(self.links[page]),
+                       self.ranks.get(page)]
+                for page in self.stamps
+            }, f)
 
-    return old_dict
 
 if __name__ == "__main__":
     main()